@@ -1,4 +1,9 @@
 from Util import *
+import Pruning
+import StateHashing
+from collections import OrderedDict
+import contextlib
+import heapq
 
 
 class OneshotSmart:
@@ -9,37 +14,201 @@ class OneshotSmart:
     The class contains different implementations of Oneshot
     """
 
-    def __init__(self, IxB, T):
+    def __init__(self, IxB, T, cache_capacity=None, cache_max_bytes=None, cache_policy="lru", step_cache=None):
+        """
+        :param IxB: A pairing transducer from the NFA I and NFA B
+        :param T: The transition transducer T
+        :param cache_capacity: the maximal number of entries of the step game cache (unbounded if None)
+        :param cache_max_bytes: the approximate maximal size of the step game cache in bytes (unbounded if None)
+        :param cache_policy: the eviction policy of a bounded step game cache: "lru", "lfu" or "cost"
+        :param step_cache: a StepGameCache shared with other OneshotSmart objects of the same T (e.g. all properties of
+        an RTS). If None, a new cache is created from the cache parameters above
+        """
         self.ignore_ambiguous = False
+        self.backward_pruning = False  # skip states that cannot reach a final state (see Pruning.BackwardPruning)
+        self.pruning = None
+        self.visited_mode = "exact"  # "exact", "fingerprint" or "bitstate" (see StateHashing.py)
+        self.bitstate_bytes = 1 << 24  # the size of the bitstate filter
+        self.error_bound = None  # the omission probability that should not be exceeded, the search stops before
+        self.max_columns = 1 << 20  # the column table is cleared when it holds more columns (not in the exact mode)
+        self.max_frontier = 1 << 20  # the maximal size of the work set or dfs stack (not in the exact mode)
+        self.visited_states = None
+        self.bounded = False  # true if the memory of the search is bounded (visited_mode is not exact)
+        self.dropped_states = 0  # keeps count of the states that were not explored because the frontier was full
+        self.column_resets = 0  # keeps count of the clearings of the column table
+        self.stopped = None  # the reason why the search stopped before it was complete, e.g. the error bound
+        self.disproved_at = {}  # the number of explored states until each property was disproved (multi_disprove)
+        self.subtree_cache = False  # cache only the columns won below a position of the step game (multi_disprove)
+        self.instrumentation = None  # an Instrumentation.Instrumentation object, if the run is instrumented
         self.IxB = IxB  # A pairing transducer from the NFA I and NFA B
         self.T = T  # The transition transducer T
         self.alphabet_map = T.get_alphabet_map()  # The alphabet map of the regular transition system
-        self.step_cache = self.StepGameCache()
+        if step_cache is None:
+            step_cache = self.StepGameCache(ColumnTable(), cache_capacity, cache_max_bytes, cache_policy)
+        self.step_cache = step_cache
+        self.step_cache.register(T)
+        self.columns = self.step_cache.columns  # assigns ids to the columns (states of the inductive transducer)
+        self.cache_baseline = self.step_cache.counters()  # the counters of the cache before this object used it
         self.expl_states = 0  # keeps count of the number of explored states
         self.expl_transitions = 0  # keeps count of the number of explored transitions 
+        self.pruned_states = 0  # keeps count of the states skipped by the backward pruning
+        self.saved_expansions = 0  # keeps count of the step game positions that were not expanded a second time
 
     class StepGameCache:
         """
-        Caches previously played step games
+        Caches previously played step games. Columns are identified by their ids in a ColumnTable.
+        The games only depend on T, so one cache can be shared by all properties (IxB) of an RTS.
+        The cache can be bounded by a number of entries and/or an approximate size in bytes. Entries are then evicted by
+        - "lru": the least recently used entry
+        - "lfu": the least frequently used entry
+        - "cost": the entry whose game was the cheapest to play (number of step game calls)
+        With a GameStore.StepGameStore the played games are also persisted on disk, a game that is not in memory is
+        then looked up in the store before it is played again.
         (For more information please refer to my thesis)
         """
 
-        def __init__(self):
-            self.cache = {}
+        policies = ("lru", "lfu", "cost")
+        entry_overhead = 200  # approximate size in bytes of a key, its slot in the cache and an empty snapshot
+
+        def __init__(self, columns, capacity=None, max_bytes=None, policy="lru", store=None):
+            """
+            :param columns: the ColumnTable of the column ids used as keys
+            :param capacity: the maximal number of entries, or None
+            :param max_bytes: the approximate maximal size in bytes, or None
+            :param policy: the eviction policy, one of StepGameCache.policies
+            :param store: a GameStore.StepGameStore of the transducer T, or None
+            """
+            if policy not in self.policies:
+                raise ValueError(f'Unknown cache policy "{policy}", use one of {self.policies}')
+            self.columns = columns
+            self.cache = OrderedDict()  # maps a game to (owner, d_winning), ordered by the last use for the lru policy
+            self.transducer = None  # the transducer T of all cached games
+            self.owner = 0  # the number of the OneshotSmart object that currently uses the cache
+            self.capacity = capacity
+            self.max_bytes = max_bytes
+            self.policy = policy
+            self.store = store
+            self.bounded = capacity is not None or max_bytes is not None
+            self.scores = {}  # maps a key to (frequency or cost, tick) for the lfu and cost policies
+            self.heap = []  # lazily updated min heap of (score, tick, key)
+            self.tick = 0
+            self.games_played = 0  # number of step game calls that were not answered by the cache
             self.cache_hits = 0  # keep track of the number of cache_hits during exploration
+            self.cache_misses = 0
+            self.shared_hits = 0  # cache hits on games that were played for an earlier owner (e.g. property)
+            self.store_hits = 0  # cache hits on games that were loaded from the store
+            self.evictions = 0
+            self.resident_bytes = 0  # the approximate size of all entries
+
+        def register(self, T):
+            """
+            Called by every OneshotSmart object that uses the cache, following entries belong to the new owner
+            :param T: the transition transducer of the OneshotSmart object
+            """
+            if self.transducer is None:
+                self.transducer = T
+            elif self.transducer is not T:
+                raise ValueError("The step game cache is shared by OneshotSmart objects of different transducers T")
+            self.owner += 1
+
+        def counters(self):
+            """
+            :return: a dictionary of the counters of the cache
+            """
+            return {"cache_hits": self.cache_hits, "cache_misses": self.cache_misses,
+                    "cache_shared_hits": self.shared_hits, "cache_store_hits": self.store_hits,
+                    "cache_evictions": self.evictions}
 
-        def add_entry(self, c, gs, v, d_current, d_winning):
-            self.cache[(tuple(c), gs.get_l(), gs.get_I(), v, tuple(d_current))] = d_winning
+        def entry_size(self, d_winning):
+            return self.entry_overhead + 8 * len(d_winning)
+
+        def add_entry(self, c, gs, v, d_current, d_winning, cost=1):
+            """
+            :param d_winning: an immutable snapshot of the winning states d in the order in which they were won
+            :param cost: the number of step game calls it took to play the game
+            """
+            key = (c, gs.get_l(), gs.get_I(), v, d_current)
+            self.insert(key, d_winning, cost)
+            if self.store is not None:
+                self.store.save(self.columns.get_column(c), gs.get_l(), gs.get_I(), v,
+                                self.columns.get_column(d_current), list(map(self.columns.get_column, d_winning)))
+
+        def insert(self, key, d_winning, cost):
+            previous = self.cache.get(key)
+            if previous is not None:
+                self.resident_bytes -= self.entry_size(previous[1])
+            self.cache[key] = (self.owner, d_winning)
+            self.resident_bytes += self.entry_size(d_winning)
+            if self.bounded:
+                if self.policy == "lru":
+                    self.cache.move_to_end(key)
+                else:
+                    score = cost if self.policy == "cost" else self.scores.get(key, (0, 0))[0] + 1
+                    self.push_score(key, score)
+                self.evict()
 
         def get_entry(self, c, gs, v, d_current):
-            look_up = self.cache.get((tuple(c), gs.get_l(), gs.get_I(), v, tuple(d_current)))
-            if look_up is not None:
-                self.cache_hits += 1
-            return look_up
+            key = (c, gs.get_l(), gs.get_I(), v, d_current)
+            look_up = self.cache.get(key)
+            if look_up is None and self.store is not None:
+                winning = self.store.load(self.columns.get_column(c), gs.get_l(), gs.get_I(), v,
+                                          self.columns.get_column(d_current))
+                if winning is not None:
+                    d_winning = tuple(map(self.columns.intern, winning))
+                    self.insert(key, d_winning, 1)  # its cost is unknown, but it can be loaded again if evicted
+                    self.cache_hits += 1
+                    self.store_hits += 1
+                    return d_winning
+            if look_up is None:
+                self.cache_misses += 1
+                return None
+            self.cache_hits += 1
+            if look_up[0] != self.owner:
+                self.shared_hits += 1
+            if self.bounded:
+                if self.policy == "lru":
+                    self.cache.move_to_end(key)
+                elif self.policy == "lfu":
+                    self.push_score(key, self.scores[key][0] + 1)
+            return look_up[1]
+
+        def push_score(self, key, score):
+            self.tick += 1
+            self.scores[key] = (score, self.tick)
+            heapq.heappush(self.heap, (score, self.tick, key))
+            if len(self.heap) > 4 * len(self.cache) + 64:  # drop outdated heap entries
+                self.heap = [(score, tick, key) for (key, (score, tick)) in self.scores.items()]
+                heapq.heapify(self.heap)
+
+        def evict(self):
+            """Evicts entries until the cache is within its bounds"""
+            while self.cache and ((self.capacity is not None and len(self.cache) > self.capacity) or (
+                    self.max_bytes is not None and self.resident_bytes > self.max_bytes)):
+                if self.policy == "lru":
+                    (_, (_, d_winning)) = self.cache.popitem(last=False)
+                else:
+                    (score, tick, key) = heapq.heappop(self.heap)
+                    if self.scores.get(key) != (score, tick):
+                        continue  # outdated heap entry
+                    del self.scores[key]
+                    (_, d_winning) = self.cache.pop(key)
+                self.resident_bytes -= self.entry_size(d_winning)
+                self.evictions += 1
+
+        def clear(self):
+            """
+            Removes all entries and assigns new ids to the columns, the games in the store are kept
+            """
+            self.columns = ColumnTable()
+            self.cache.clear()
+            self.scores.clear()
+            self.heap = []
+            self.resident_bytes = 0
 
         def print(self):
-            for key in self.cache:
-                print(f'{key} -> {self.cache[key]}')
+            for (c, l, I, v, d_current) in self.cache:
+                print(f'{(self.columns.get_column(c), l, I, v, self.columns.get_column(d_current))} -> '
+                      f'{list(map(self.columns.get_column, self.cache[(c, l, I, v, d_current)][1]))}')
 
     def min_sigma_disprove_oneshot(self, gen_func):
         """
@@ -49,7 +218,14 @@ class OneshotSmart:
         :param gen_func: the generator function implementation for the construction of the seperator transducer
         :return: False if property was disproved
         """
-        self.T = self.T.copy_with_restricted_trans(self.IxB.partial_sigma_origin, self.IxB.partial_sigma_target)
+        with self.phase("restriction"):
+            self.T = self.T.copy_with_restricted_trans(self.IxB.partial_sigma_origin, self.IxB.partial_sigma_target)
+        # the games of the restricted T differ from the games of T, so a shared cache must not be used
+        cache = self.step_cache
+        self.step_cache = self.StepGameCache(ColumnTable(), cache.capacity, cache.max_bytes, cache.policy)
+        self.step_cache.register(self.T)
+        self.columns = self.step_cache.columns
+        self.cache_baseline = self.step_cache.counters()
         value = self.oneshot_dfs(gen_func)
         if not value:
             print("Property could not be established!")
@@ -61,36 +237,81 @@ class OneshotSmart:
         :param gen_func: the generator function implementation for the construction of the seperator transducer
         :return: A final state in the intersection or none
         """
-        (ib0, c0) = (self.IxB.get_initial_states()[0], [self.T.get_initial_states()[0]])
-        visited_states = {(ib0, tuple(c0))}
+        (ib0, c0) = (self.IxB.get_initial_states()[0], self.columns.intern([self.T.get_initial_states()[0]]))
+        self.pruning = Pruning.BackwardPruning(self.IxB, self.T) if self.backward_pruning else None
+        if self.pruning is not None and not self.pruning.is_alive(ib0, self.columns.get_column(c0)):
+            return None
+        visited_states = self.new_visited_states((ib0, c0))
         for a in self.oneshot_dfs_helper(ib0, c0, visited_states, gen_func):
             return a
         return None
 
     def oneshot_dfs_helper(self, ib, c, visited_states, gen_func):
         """
-        A helper function for one_shot_dfs
+        A helper function for one_shot_dfs. Instead of recursing, the dfs keeps an explicit stack of the successor
+        generators of the states on the current path, so a found state is returned directly and the depth of the
+        intersection transducer is not limited by the recursion limit
         :param ib: a state from the transducer IxB
-        :param c: a state from the inductive transducer
-        :param visited_states: a list of the already visited staes ib ∩ c
+        :param c: the column id of a state from the inductive transducer
+        :param visited_states: a set of the already visited staes ib ∩ c
         :param gen_func: the generator function implementation for the construction of the seperator transducer
         :return:  A final state in the intersection transducer or none
         """
+        stack = [self.oneshot_successors(ib, c, gen_func)]
+        while stack:
+            for (ib_succ, d) in stack[-1]:
+                self.expl_transitions += 1
+                if self.state_key(ib_succ, d) not in visited_states:
+                    visited_states.add(self.state_key(ib_succ, d))
+                    if self.pruning is not None and not self.pruning.is_alive(ib_succ, self.columns.get_column(d)):
+                        self.pruned_states += 1
+                        continue
+                    if self.bounded and self.frontier_full(visited_states, len(stack)):
+                        if self.stopped is not None:
+                            return
+                        continue
+                    self.expl_states += 1
+                    if self.instrumentation is not None and \
+                            self.expl_states % self.instrumentation.sample_interval == 0:
+                        self.instrumentation.sample(self, len(stack))
+                    if self.IxB.is_final_state(ib_succ) and self.T.are_final_states(self.columns.get_mask(d)):
+                        yield ib_succ, self.columns.get_column(d)
+                    stack.append(self.oneshot_successors(ib_succ, d, gen_func))  # continue the dfs at (ib_succ, d)
+                    break
+            else:  # all successors of the state on top of the stack are explored
+                stack.pop()
+
+    def oneshot_successors(self, ib, c, gen_func):
+        """
+        :param ib: a state from the transducer IxB
+        :param c: the column id of a state from the inductive transducer
+        :param gen_func: the generator function implementation for the construction of the seperator transducer
+        :return: Lazily return all successors (ib_successor, d) of (ib ∩ c) in the intersection transducer. If the
+        memory is bounded, the id d is only valid until the next successor is requested from any state, as the column
+        table may be cleared in between
+        """
+        column = self.columns.get_column(c)
         # iterate over all transitions of the state ixb
         for (ib_trans, ib_succ) in self.IxB.get_transitions(ib):
             u, v = self.alphabet_map.get_y(ib_trans), self.alphabet_map.get_x(ib_trans)
+            if self.pruning is not None and not self.pruning.can_step(column, u, v, ib_succ):
+                continue
             gs = Triple(0, refine_seperator(self.alphabet_map.get_bit_map_sigma(), u), 0)
 
             # iterate over all reachable (ib ∩ c) -> (ib_successor ∩ d)
-            for d in gen_func(self, c, [], v, gs, []):
-                self.expl_transitions += 1
-                if (ib_succ, tuple(d)) not in visited_states:
-                    visited_states.add((ib_succ, tuple(d)))
-                    self.expl_states += 1
-                    if self.IxB.is_final_state(ib_succ) and len(
-                            list((filter(lambda q: (not self.T.is_final_state(q)), d)))) == 0:
-                        yield ib_succ, d
-                    yield from self.oneshot_dfs_helper(ib_succ, d, visited_states, gen_func)
+            wins = 0
+            if self.bounded:  # the step game is played to the end, so no ids are kept while other states are expanded
+                c = self.column_id(column)
+                for d in [self.columns.get_column(d) for d in gen_func(self, c, self.columns.empty, v, gs,
+                                                                         VisitedColumns())]:
+                    wins += 1
+                    yield ib_succ, self.columns.intern(d)
+            else:
+                for d in gen_func(self, c, self.columns.empty, v, gs, VisitedColumns()):
+                    wins += 1
+                    yield ib_succ, d
+            if self.instrumentation is not None:
+                self.instrumentation.game_finished(wins)
 
     def oneshot_bfs(self, gen_func):
         """
@@ -99,76 +320,181 @@ class OneshotSmart:
         :return: A final state in the intersection transducer or none
         """
         # Pairing of the initial states of (ixb ∩ reduced seperator transducer)
-        (ib0, c0) = (self.IxB.get_initial_states()[0], [self.T.get_initial_states()[0]])
-        work_set = [(ib0, c0)]
-        visited_states = {(ib0, tuple(c0))}
+        (ib0, c0) = (self.IxB.get_initial_states()[0], self.columns.intern([self.T.get_initial_states()[0]]))
+        self.pruning = Pruning.BackwardPruning(self.IxB, self.T) if self.backward_pruning else None
+        if self.pruning is not None and not self.pruning.is_alive(ib0, self.columns.get_column(c0)):
+            return None
+        visited_states = self.new_visited_states((ib0, c0))
+        work_set = [self.frontier_entry(ib0, c0)]
 
         while len(work_set) != 0:
             (ib, c) = work_set.pop(0)
+            if self.bounded:
+                c = self.column_id(c)
 
             # iterate over all transitions of the state ixb
             for (ib_trans, ib_succ) in self.IxB.get_transitions(ib):
 
                 u, v = self.alphabet_map.get_y(ib_trans), self.alphabet_map.get_x(ib_trans)
+                if self.pruning is not None and not self.pruning.can_step(self.columns.get_column(c), u, v, ib_succ):
+                    continue
                 gs = Triple(0, refine_seperator(self.alphabet_map.get_bit_map_sigma(), u), 0)
 
                 # iterate over all reachable (ib ∩ c) -> (ib_successor ∩ d)
-                for d in gen_func(self, c, [], v, gs, []):
+                wins = 0
+                for d in gen_func(self, c, self.columns.empty, v, gs, VisitedColumns()):
+                    wins += 1
                     self.expl_transitions += 1
-                    if (ib_succ, tuple(d)) not in visited_states:
-                        visited_states.add((ib_succ, tuple(d)))
-                        work_set.append((ib_succ, d))
+                    if self.state_key(ib_succ, d) not in visited_states:
+                        visited_states.add(self.state_key(ib_succ, d))
+                        if self.pruning is not None and not self.pruning.is_alive(ib_succ, self.columns.get_column(d)):
+                            self.pruned_states += 1
+                            continue
+                        if self.bounded and self.frontier_full(visited_states, len(work_set)):
+                            if self.stopped is not None:
+                                return None
+                            continue
+                        work_set.append(self.frontier_entry(ib_succ, d))
                         self.expl_states += 1
-                        if self.IxB.is_final_state(ib_succ) and len(
-                                list((filter(lambda q: (not self.T.is_final_state(q)), d)))) == 0:
-                            return ib_succ, d
+                        if self.instrumentation is not None and \
+                                self.expl_states % self.instrumentation.sample_interval == 0:
+                            self.instrumentation.sample(self, len(work_set))
+                        if self.IxB.is_final_state(ib_succ) and self.T.are_final_states(self.columns.get_mask(d)):
+                            return ib_succ, self.columns.get_column(d)
+                if self.instrumentation is not None:
+                    self.instrumentation.game_finished(wins)
         return None
 
+    def multi_disprove_oneshot(self, gen_func):
+        """
+        Explore the intersection transducer of all properties of an RTS at once in a bfs, IxB has to be an
+        Automata.MultiPairing. The step games only depend on the columns and the symbols of a transition, so they are
+        played once for all properties. A property is disproved as soon as a state that is final for it is reached, the
+        search stops when all properties are disproved. The backward pruning is not used, it needs the whole pairing.
+        The step game cache only keeps the columns won below a position (subtree_cache): the columns won earlier in the
+        same top-level game depend on the order in which the games are played, which differs from the single property
+        searches and would make the cached games win columns they cannot win
+        :param gen_func: the generator function implementation for the construction of the seperator transducer
+        :return: a dictionary that maps every property to a final state in the intersection transducer or None
+        """
+        (ib0, c0) = (self.IxB.get_initial_states()[0], self.columns.intern([self.T.get_initial_states()[0]]))
+        self.pruning = None
+        self.subtree_cache = True
+        results = {name: None for name in self.IxB.properties}
+        self.disproved_at = {}  # maps a disproved property to the number of states explored until it was disproved
+        visited_states = self.new_visited_states((ib0, c0))
+        work_set = [self.frontier_entry(ib0, c0)]
+
+        while len(work_set) != 0:
+            (ib, c) = work_set.pop(0)
+            if self.bounded:
+                c = self.column_id(c)
+
+            # iterate over all transitions of the state ixb
+            for (ib_trans, ib_succ) in self.IxB.get_transitions(ib):
+                u, v = self.alphabet_map.get_y(ib_trans), self.alphabet_map.get_x(ib_trans)
+                gs = Triple(0, refine_seperator(self.alphabet_map.get_bit_map_sigma(), u), 0)
+
+                # iterate over all reachable (ib ∩ c) -> (ib_successor ∩ d)
+                wins = 0
+                for d in gen_func(self, c, self.columns.empty, v, gs, VisitedColumns()):
+                    wins += 1
+                    self.expl_transitions += 1
+                    if self.state_key(ib_succ, d) not in visited_states:
+                        visited_states.add(self.state_key(ib_succ, d))
+                        if self.bounded and self.frontier_full(visited_states, len(work_set)):
+                            if self.stopped is not None:
+                                return results
+                            continue
+                        work_set.append(self.frontier_entry(ib_succ, d))
+                        self.expl_states += 1
+                        if self.instrumentation is not None and \
+                                self.expl_states % self.instrumentation.sample_interval == 0:
+                            self.instrumentation.sample(self, len(work_set))
+                        if self.T.are_final_states(self.columns.get_mask(d)):
+                            for name in self.IxB.final_properties(ib_succ):
+                                if results[name] is None:
+                                    results[name] = (ib_succ, self.columns.get_column(d))
+                                    self.disproved_at[name] = self.expl_states
+                            if len(self.disproved_at) == len(results):
+                                return results
+                if self.instrumentation is not None:
+                    self.instrumentation.game_finished(wins)
+        return results
+
+    def new_visited_states(self, state):
+        """
+        :param state: the initial state (ib, c) of the intersection transducer
+        :return: the container of the visited states, a set of the states or of their hashes (see visited_mode)
+        """
+        if self.visited_mode not in StateHashing.visited_modes:
+            raise ValueError(f'Unknown visited mode "{self.visited_mode}", use one of {StateHashing.visited_modes}')
+        self.bounded = self.visited_mode != "exact"
+        (self.dropped_states, self.column_resets, self.stopped) = (0, 0, None)
+        if self.visited_mode == "fingerprint":
+            self.visited_states = StateHashing.FingerprintSet(error_bound=self.error_bound)
+        elif self.visited_mode == "bitstate":
+            self.visited_states = StateHashing.BitstateSet(self.bitstate_bytes, error_bound=self.error_bound)
+        else:
+            self.visited_states = set()
+        self.visited_states.add(self.state_key(*state))
+        return self.visited_states
+
+    def state_key(self, ib, d):
+        """
+        :return: the key of the state (ib, d) in the visited states. If the memory is bounded, the column ids change
+        when the column table is cleared, so the states are hashed with their columns
+        """
+        return (ib, self.columns.get_column(d)) if self.bounded else (ib, d)
+
+    def frontier_entry(self, ib, d):
+        """
+        :return: the entry of the state (ib, d) in the work set, with its column instead of its id if the memory is
+        bounded (see column_id)
+        """
+        return (ib, self.columns.get_column(d)) if self.bounded else (ib, d)
+
+    def column_id(self, column):
+        """
+        Clears the column table and the step game cache, whose keys are column ids, if the table holds more than
+        max_columns columns. Only called between two games, when no ids are kept by the search
+        :param column: a column (tuple of T states)
+        :return: the id of the column
+        """
+        if len(self.columns) > self.max_columns:
+            self.step_cache.clear()
+            self.columns = self.step_cache.columns
+            self.column_resets += 1
+        return self.columns.intern(column)
+
+    def frontier_full(self, visited_states, frontier):
+        """
+        Called for a new state if the memory is bounded
+        :param visited_states: the visited states, the search stops once their error bound is exceeded
+        :param frontier: the size of the work set or dfs stack
+        :return: true if the state must not be explored, because the frontier is full or the search stopped
+        """
+        if visited_states.bound_exceeded_at is not None:
+            self.stopped = f'error bound {self.error_bound} exceeded after {visited_states.bound_exceeded_at} states'
+            return True
+        if frontier >= self.max_frontier:
+            self.dropped_states += 1
+            return True
+        return False
+
     def step_game_gen_buffered_bfs(self, c1, c2, v, gs, visited):
         """
         This function lazily constructs states of the inductive transducer G_trap in a bfs.
         (For more information refer to my thesis)
-        :param c1: List of the from-column
-        :param c2: List of the to-column
+        :param c1: The column id of the from-column
+        :param c2: The column id of the to-column
         :param v: The symbol to be removed from the seperator
         :param gs: The game state <l, I, c_d>
-        :param visited: A list keeping track of all winning states d
+        :param visited: A VisitedColumns object keeping track of all winning states d
         :return: Lazily return states d of the inductive transducer
         Uses the same cache as the one_shot implementation of dodo, returns states d in a bfs
         """
-        next_marked = []  # store if the next step gs_, c_ has been explored already
-        if c2 in visited:  # Return if c2 has been visited
-            return
-        cache_hit = self.step_cache.get_entry(c1, gs, v, c2)  # Check if this partially played game is in cache
-        if cache_hit is not None:
-            for hit in cache_hit:
-                yield hit
-            return
-
-        if len(c1) == gs.get_l() and symbol_not_in_seperator(gs.get_I(), v):  # Return c2 if step game is won
-            visited.append(c2)
-            yield c2
-
-        candidates = []
-        for (q, trans_gen) in map(lambda origin: (origin, self.T.get_transitions(origin)), c1[:gs.get_l() + 1]):
-            for (qp_t, p) in trans_gen:
-                x, y = self.alphabet_map.get_x(qp_t), self.alphabet_map.get_y(qp_t)
-                if symbol_not_in_seperator(gs.get_I(), y):
-                    if p not in c2:
-                        c2_ = c2 + [p]
-                        if c2_ in visited:
-                            continue
-                    else:
-                        c2_ = c2
-                    gs_ = Triple(gs.get_l() + (1, 0)[q in c1[:gs.get_l()]], refine_seperator(gs.get_I(), x),
-                                 gs.get_d_p() + (1, 0)[p in c2])
-                    if not gs.equal(gs_) and (gs_.get_l(), gs.get_I(), c2_) not in next_marked:
-                        if self.ignore_ambiguous:
-                            next_marked.append((gs_.get_l(), gs.get_I(), c2_))
-                        candidates.append((c2_, gs_))
-        for (c2_, gs_) in candidates:
-            yield from self.step_game_gen_buffered_bfs(c1, c2_, v, gs_, visited)
-        self.step_cache.add_entry(c1, gs, v, c2, visited)  # Add Game to cache
+        yield from self.play_step_game(c1, c2, v, gs, visited, True, True)
 
     def step_game_gen_simple_dfs(self, c1, c2, v, gs, visited):
         """Executes step_game_gen_dfs_helper without the use of the cache"""
@@ -183,56 +509,163 @@ class OneshotSmart:
         This function lazily constructs states of the inductive transducer G_trap in a dfs.
         (For more information refer to my thesis)
         :param use_cache: if true the cache is used
-        :param c1: List of the from-column
-        :param c2: List of the to-column
+        :param c1: The column id of the from-column
+        :param c2: The column id of the to-column
         :param v: The symbol to be removed from the seperator
         :param gs: The game state <l, I, c_d>
-        :param visited: A list keeping track of all winning states d
+        :param visited: A VisitedColumns object keeping track of all winning states d
         :return: Lazily return states d of the inductive transducer
         Uses the same cache as the one_shot implementation of dodo, returns states d in a dfs
         """
-        next_marked = []  # used to exclude ambitious step games from consideration
-        if c2 in visited:  # Return if c2 has been visited
-            return
-        if use_cache:
-            cache_hit = self.step_cache.get_entry(c1, gs, v, c2)  # Check if this partially played game is in cache
-            if cache_hit is not None:
-                for hit in cache_hit:
-                    yield hit
-                return
-
-        if len(c1) == gs.get_l() and symbol_not_in_seperator(gs.get_I(), v):  # Return c2 if step game is won
-            visited.append(c2)
-            yield c2
-
-        # Try to make progress in the step game
-        for (q, trans_gen) in map(lambda origin: (origin, self.T.get_transitions(origin)), c1[:gs.get_l() + 1]):
-            for (qp_t, p) in trans_gen:
-                x, y = self.alphabet_map.get_x(qp_t), self.alphabet_map.get_y(qp_t)
-                if symbol_not_in_seperator(gs.get_I(), y):
-                    if p not in c2:
-                        c2_ = c2 + [p]
-                        if c2_ in visited:
-                            continue
-                    else:
-                        c2_ = c2
-                    gs_ = Triple(gs.get_l() + (1, 0)[q in c1[:gs.get_l()]], refine_seperator(gs.get_I(), x),
-                                 gs.get_d_p() + (1, 0)[p in c2])
-                    if not gs.equal(gs_) and (gs_.get_l(), gs.get_I(), c2_) not in next_marked:
-                        if self.ignore_ambiguous:
-                            next_marked.append((gs_.get_l(), gs.get_I(), c2_))
-                        yield from self.step_game_gen_dfs_helper(c1, c2_, v, gs_, visited, use_cache)
-        self.step_cache.add_entry(c1, gs, v, c2, visited)  # Add played game to cache
+        yield from self.play_step_game(c1, c2, v, gs, visited, use_cache, False)
+
+    def play_step_game(self, c1, c2, v, gs, visited, use_cache, buffered):
+        """
+        Plays the step game from the game state gs. The partially played games on the current path are kept on an
+        explicit stack instead of nested generators, so a won state d is returned directly and the length of a game is
+        not limited by the recursion limit
+        :param c1: The column id of the from-column
+        :param c2: The column id of the to-column
+        :param v: The symbol to be removed from the seperator
+        :param gs: The game state <l, I, c_d>
+        :param visited: A VisitedColumns object keeping track of all winning states d
+        :param use_cache: if true the cache is used
+        :param buffered: if true all moves of a game state are computed before the first one is played (bfs), otherwise
+        the next move is computed after the previous one was played (dfs)
+        :return: Lazily return states d of the inductive transducer
+        """
+        column1 = self.columns.get_column(c1)
+        stack = []  # the partially played games: (remaining moves, c2, gs, games played before, columns won before)
+        game = (c2, gs)  # the next game to be played
+        while game is not None or stack:
+            if game is None:
+                (moves, c2, gs, games_before, won_before) = stack[-1]
+                game = next(moves, None)
+                if game is None:  # all moves of the game on top of the stack are played
+                    stack.pop()
+                    won = visited.snapshot()
+                    if self.subtree_cache:
+                        won = won[won_before:]
+                    self.step_cache.add_entry(c1, gs, v, c2, won,
+                                              self.step_cache.games_played - games_before)  # Add played game to cache
+                continue
+
+            (c2, gs) = game
+            game = None
+            if c2 in visited:  # Skip the game if c2 has been visited
+                continue
+            if not visited.expand((gs.get_l(), gs.get_I(), c2)):  # the position was expanded earlier in this game
+                self.saved_expansions += 1
+                continue
+            if use_cache:
+                cache_hit = self.step_cache.get_entry(c1, gs, v, c2)  # Check if this partially played game is in cache
+                if cache_hit is not None:
+                    for hit in cache_hit:
+                        yield hit
+                    continue
+            games_before = self.step_cache.games_played
+            won_before = len(visited)
+            self.step_cache.games_played += 1
+            if self.instrumentation is not None:
+                self.instrumentation.step_game(len(stack))
+
+            if len(column1) == gs.get_l() and symbol_not_in_seperator(gs.get_I(), v):  # Return c2 if step game is won
+                visited.add(c2)
+                yield c2
+
+            moves = self.step_game_moves(column1, c2, gs, visited)
+            stack.append((iter(list(moves)) if buffered else moves, c2, gs, games_before, won_before))
+
+    def step_game_moves(self, column1, c2, gs, visited):
+        """
+        Lazily computes the moves that make progress in a step game
+        :param column1: The from-column as a tuple of T states
+        :param c2: The column id of the to-column
+        :param gs: The game state <l, I, c_d>
+        :param visited: A VisitedColumns object keeping track of all winning states d
+        :return: Lazily return the next games (c2_, gs_)
+        """
+        next_marked = set()  # used to exclude ambitious step games from consideration
+        # all transitions [x,y] of the states q in c1[:l+1] whose y is not in the seperator
+        for (i, x_bit, p) in self.T.get_target_index().prefix_moves(column1[:gs.get_l() + 1], gs.get_I()):
+            l_ = gs.get_l() + (1, 0)[i < gs.get_l()]  # q is in c1[:l] iff i < l, as columns contain no duplicates
+            p_in_c2 = self.columns.contains(c2, p)
+            if not p_in_c2:
+                c2_ = self.columns.extend(c2, p)
+                if c2_ in visited:
+                    continue
+            else:
+                c2_ = c2
+            gs_ = Triple(l_, gs.get_I() & ~x_bit, gs.get_d_p() + (1, 0)[p_in_c2])
+            if not gs.equal(gs_) and (gs_.get_l(), gs.get_I(), c2_) not in next_marked:
+                if self.ignore_ambiguous:
+                    next_marked.add((gs_.get_l(), gs.get_I(), c2_))
+                yield c2_, gs_
+
+    def phase(self, name):
+        """
+        :param name: the name of a phase of the run, e.g. "search"
+        :return: a context manager that measures the duration of the phase if the run is instrumented
+        """
+        if self.instrumentation is None:
+            return contextlib.nullcontext()
+        return self.instrumentation.phase(name)
+
+    def statistics(self):
+        """
+        :return: a dictionary of the statistics of the last execution of oneshot
+        """
+        statistics = {"states": self.expl_states, "transitions": self.expl_transitions,
+                      "pruned_states": self.pruned_states, "saved_expansions": self.saved_expansions,
+                      "visited_mode": self.visited_mode, "exact": self.visited_mode == "exact",
+                      "omission_probability": 0.0}
+        if self.visited_mode != "exact" and self.visited_states is not None:
+            statistics["omission_probability"] = self.visited_states.omission_probability()
+            statistics["visited_bytes"] = self.visited_states.nbytes()
+            statistics["error_bound_exceeded_at"] = self.visited_states.bound_exceeded_at
+            statistics["dropped_states"] = self.dropped_states
+            statistics["column_resets"] = self.column_resets
+            statistics["stopped"] = self.stopped
+        counters = self.step_cache.counters()
+        for counter in counters:  # only count the cache accesses of this object, the cache may be shared
+            statistics[counter] = counters[counter] - self.cache_baseline[counter]
+        statistics["cache_size"] = len(self.step_cache.cache)
+        statistics["cache_bytes"] = self.step_cache.resident_bytes
+        return statistics
 
     def print_oneshot_result(self, result_bool):
         """
         Print statistics after the execution of oneshot
-        :param result_bool: determines if the property was proved or disproved
+        :param result_bool: determines if the property was proved or disproved, a dictionary of the results of all
+        properties for multi_disprove_oneshot
         """
+        statistics = self.statistics()
         print("# states: " + str(self.expl_states))
-        print("# cache hits: " + str(self.step_cache.cache_hits))
+        if self.backward_pruning:
+            print("# pruned states: " + str(self.pruned_states))
+        if self.visited_mode != "exact":
+            print(f'# visited states: {self.visited_mode}, probabilistic (omission probability '
+                  f'{statistics["omission_probability"]:.2e}, {statistics["visited_bytes"]} bytes)')
+            print(f'# dropped states (full frontier): {self.dropped_states}, column table resets: '
+                  f'{self.column_resets}')
+            if self.stopped is not None:
+                print(f'# stopped: {self.stopped}')
+        print("# saved step game expansions: " + str(self.saved_expansions))
+        print("# cache hits: " + str(statistics["cache_hits"]))
+        print("# cache hits from earlier properties: " + str(statistics["cache_shared_hits"]))
+        print("# cache hits from the store: " + str(statistics["cache_store_hits"]))
+        print("# cache misses: " + str(statistics["cache_misses"]))
+        print("# cache evictions: " + str(statistics["cache_evictions"]))
         print("# transitions: " + str(self.expl_transitions))
-        if result_bool is None:
-            print("Result: ✓")
+        # without a counterexample, a search that is not exact is no proof
+        proved = "✓" if statistics["exact"] else "? (no counterexample found, the search is not exact)"
+        if self.stopped is not None:
+            proved = f'? (stopped, {self.stopped})'
+        if isinstance(result_bool, dict):  # the results of all properties of multi_disprove_oneshot
+            for (name, result) in result_bool.items():
+                disproved = f'x (after {self.disproved_at.get(name)} states)'
+                print(f'Result {name}: ' + (proved if result is None else disproved))
+        elif result_bool is None:
+            print(f'Result: {proved}')
         else:
             print("Result: x")
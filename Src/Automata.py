@@ -3,19 +3,9 @@ import graphviz as gviz
 from abc import ABC, abstractmethod
 from itertools import *
 import json
+from collections import deque
 import re
-
-
-def hash_state(column_list):
-    """
-    Used for the efficient representation of seperator transducer states 
-    :param column_list: the column that is supposed to be hashed 
-    :return: combines all states in column_list in to a string and returns the integer representation of that string
-    """
-    state_str = ""
-    for state in column_list:
-        state_str += str(state + 1)  # Important!!! + 1 to generate unique hash for columns with q0 states
-    return int(state_str)
+import time
 
 
 class AbstractTransducer(ABC):
@@ -78,17 +68,27 @@ class AbstractTransducer(ABC):
 
 class NFATransducer(AbstractTransducer):
 
-    def __init__(self, alphabet_map):
+    def __init__(self, alphabet_map, transitions=None):
         """
         :param alphabet_map: The alphabet map for the transducer
+        :param transitions: An AbstractStorage object with the transition relation, by default an empty SimpleStorageNFA
         """
         self.state_count = 0  # The number of states in the transducer
         self.initial_states = []  # A list of the initial states
         self.final_states = []  # A list of the final states
+        self.final_state_mask = 0  # The bit map of the final states
         self.alphabet_map = alphabet_map
         self.partial_sigma_origin = set()  # contains all actually used origin symbols
         self.partial_sigma_target = set()  # contains all actually used target symbols
         self.transitions = Storage.SimpleStorageNFA()  # captures the transition relation of the transducer
+        if transitions is not None:
+            self.transitions = transitions
+            for q in transitions.state_iterator():
+                for (x_y_int, _) in transitions.transition_iterator(q):
+                    self.partial_sigma_origin.add(self.alphabet_map.get_x(x_y_int))
+                    self.partial_sigma_target.add(self.alphabet_map.get_y(x_y_int))
+        self.target_index = None  # transitions grouped by target symbol, built on first use
+        self.state_encoder = None  # decodes the states of pairings and subset constructions (for debugging)
 
     def set_state_count(self, state_count):
         self.state_count = state_count
@@ -103,14 +103,23 @@ class NFATransducer(AbstractTransducer):
         self.initial_states.extend(initial_state_list)
 
     def is_final_state(self, state):
-        return state in self.final_states
+        return (self.final_state_mask >> state) & 1 == 1
+
+    def are_final_states(self, state_mask):
+        """
+        :param state_mask: the bit map of a set of states
+        :return: whether all states of the set are final states of the transducer
+        """
+        return state_mask & ~self.final_state_mask == 0
 
     def add_final_state(self, state):
-        if state not in self.final_states:
+        if not self.is_final_state(state):
             self.final_states.append(state)
+            self.final_state_mask |= 1 << state
 
     def add_final_state_list(self, state_list):
-        self.final_states.extend(state_list)
+        for state in state_list:
+            self.add_final_state(state)
 
     def get_final_states(self):
         return self.final_states
@@ -122,6 +131,7 @@ class NFATransducer(AbstractTransducer):
         self.partial_sigma_origin.add(self.alphabet_map.get_x(x_y_int))
         self.partial_sigma_target.add(self.alphabet_map.get_y(x_y_int))
         self.transitions.add_transition(origin, x_y_int, target)
+        self.target_index = None
 
     def get_transitions(self, origin):
         yield from self.transitions.transition_iterator(origin)
@@ -129,9 +139,33 @@ class NFATransducer(AbstractTransducer):
     def get_successors(self, origin, x_y_int):
         return self.transitions.get_successors(origin, x_y_int)
 
+    def get_target_index(self):
+        """
+        :return: the TargetSymbolIndex of the transition relation. The index is built once and rebuilt only after new
+        transitions were added
+        """
+        if self.target_index is None:
+            self.target_index = self.transitions.target_index(self.alphabet_map)
+        return self.target_index
+
     def state_iterator(self):
         return self.transitions.state_iterator()
 
+    def copy_with_storage(self, transitions):
+        """
+        :param transitions: an empty AbstractStorage object, e.g. a Storage.NumpyStorageNFA
+        :return: a copy of the transducer whose transition relation is stored in transitions
+        """
+        copy = NFATransducer(self.alphabet_map, transitions)
+        copy.set_state_count(self.state_count)
+        copy.add_initial_state_list(self.initial_states)
+        copy.add_final_state_list(self.final_states)
+        copy.state_encoder = self.state_encoder
+        for q in self.state_iterator():
+            for (x_y_int, p) in self.transitions.transition_iterator(q):
+                copy.add_transition(q, x_y_int, p)
+        return copy
+
     def copy_with_restricted_trans(self, origin_symbols, target_symbols):
         """
         Create a copy of the transducer and remove all transitions where:
@@ -149,7 +183,7 @@ class NFATransducer(AbstractTransducer):
                 if self.alphabet_map.get_x(x_y_int) in origin_symbols and self.alphabet_map.get_y(
                         x_y_int) in target_symbols:
                     copy.add_transition(q, x_y_int, p)
-                    if p in self.final_states:
+                    if self.is_final_state(p):
                         copy.add_final_state(p)
         return copy
 
@@ -178,33 +212,258 @@ class NFATransducer(AbstractTransducer):
 
         g.view()
 
+    def successor_bit_maps(self):
+        """
+        :return: a dictionary q -> x_y_int -> bit map of all successors of q via x_y_int
+        """
+        successors = {}
+        for q in self.state_iterator():
+            q_successors = successors[q] = {}
+            for (x_y_int, p) in self.transitions.transition_iterator(q):
+                q_successors[x_y_int] = q_successors.get(x_y_int, 0) | (1 << p)
+        return successors
+
+    def is_deterministic(self):
+        """
+        :return: true if the transducer has one initial state and at most one successor per state and symbol
+        """
+        if len(self.initial_states) != 1:
+            return False
+        for q in self.state_iterator():
+            q_successors = {}
+            for (x_y_int, p) in self.transitions.transition_iterator(q):
+                if q_successors.setdefault(x_y_int, p) != p:
+                    return False
+        return True
+
     def nfa_to_dfa(self):
         """
-        :return: Return a deterministic transducer from the non-deterministic transducer
+        :return: Return a deterministic transducer from the non-deterministic transducer.
+        Subsets are represented as bit maps and only the symbols used by the states of a subset are tried.
+        The states of the result are dense ids, the state_encoder of the result maps them back to the subsets
         """
         result = NFATransducer(self.alphabet_map)
-        work_queue = [self.initial_states.copy()]
-        visited = [self.initial_states.copy()]
-        result.initial_states = list(map(lambda x: hash_state([x]), self.initial_states.copy()))
+        encoder = Storage.DenseEncoder(Storage.SubsetEncoder())
+        result.state_encoder = encoder
+        successors = self.successor_bit_maps()
+        final_bits = self.final_state_mask
+
+        initial_subset = Storage.SubsetEncoder.encode(self.initial_states)
+        result.add_initial_state(encoder.encode(initial_subset))
+        work_queue = deque([initial_subset])
+
+        while work_queue:
+            q_subset = work_queue.popleft()
+            new_q = encoder.encode(q_subset)
+            if q_subset & final_bits:
+                result.add_final_state(new_q)
 
-        while len(work_queue) != 0:
-            q_list = work_queue.pop(0)
+            # combine the successors of all states in the subset per symbol
+            p_subsets = {}
+            for q in Storage.SubsetEncoder.decode(q_subset):
+                for (x_y_int, p_bits) in successors.get(q, {}).items():
+                    p_subsets[x_y_int] = p_subsets.get(x_y_int, 0) | p_bits
+
+            for (x_y_int, p_subset) in p_subsets.items():
+                if p_subset not in encoder.ids:
+                    work_queue.append(p_subset)
+                result.add_transition(new_q, x_y_int, encoder.encode(p_subset))
+        result.set_state_count(len(encoder))
+        return result
 
-            new_q = hash_state(q_list)
-            if any(map(lambda x: x in self.final_states, q_list)):
+    def minimize(self):
+        """
+        Hopcroft's partition refinement on the (implicitly completed) deterministic transducer.
+        Non-deterministic transducers are determinized first. States that cannot reach a final state are removed.
+        :return: the minimal deterministic transducer, the state_encoder of the result maps each state to the list of
+        states it merges
+        """
+        dfa = self if self.is_deterministic() else self.nfa_to_dfa()
+
+        # Number the reachable states densely and complete the transition function with a sink state
+        states = Storage.DenseEncoder()
+        states.encode(dfa.initial_states[0])
+        delta = []
+        symbols = set()
+        i = 0
+        while i < len(states):
+            q_delta = {}
+            for (x_y_int, p) in dfa.get_transitions(states.states[i]):
+                q_delta[x_y_int] = states.encode(p)
+                symbols.add(x_y_int)
+            delta.append(q_delta)
+            i += 1
+        sink = len(states)
+        delta.append({})
+        n = sink + 1
+
+        predecessors = {x_y_int: [[] for _ in range(n)] for x_y_int in symbols}
+        for q in range(n):
+            for x_y_int in symbols:
+                predecessors[x_y_int][delta[q].get(x_y_int, sink)].append(q)
+
+        # Hopcroft: refine {F, Q\F} until the partition is stable
+        final = {q for q in range(sink) if dfa.is_final_state(states.states[q])}
+        blocks = [block for block in (final, set(range(n)) - final) if block]
+        block_of = [0] * n
+        for (b, block) in enumerate(blocks):
+            for q in block:
+                block_of[q] = b
+        work_set = {min(range(len(blocks)), key=lambda b: len(blocks[b]))}
+        while work_set:
+            splitter = list(blocks[work_set.pop()])
+            for x_y_int in symbols:
+                x_set = {q for p in splitter for q in predecessors[x_y_int][p]}
+                touched = {}
+                for q in x_set:
+                    touched.setdefault(block_of[q], set()).add(q)
+                for (b, inside) in touched.items():
+                    if len(inside) == len(blocks[b]):
+                        continue
+                    outside = blocks[b] - inside
+                    new_b = len(blocks)
+                    (blocks[b], small) = (outside, inside) if len(inside) <= len(outside) else (inside, outside)
+                    blocks.append(small)
+                    for q in small:
+                        block_of[q] = new_b
+                    # if b is still to be processed both halves are, otherwise the smaller half suffices
+                    work_set.add(new_b)
+
+        # Build the quotient without the block of the sink state
+        result = NFATransducer(self.alphabet_map)
+        encoder = Storage.DenseEncoder()  # maps the states of the result to the tuples of the states they merge
+        result.state_encoder = encoder
+        merged = [tuple(sorted(states.states[q] for q in block if q != sink)) for block in blocks]
+        dead = block_of[sink]
+        result.add_initial_state(encoder.encode(merged[block_of[0]]))
+        work_queue = deque([block_of[0]] if block_of[0] != dead else [])
+        while work_queue:
+            b = work_queue.popleft()
+            new_q = encoder.encode(merged[b])
+            representative = next(iter(blocks[b]))
+            if representative in final:
                 result.add_final_state(new_q)
+            for (x_y_int, p) in delta[representative].items():
+                if block_of[p] == dead:
+                    continue
+                if merged[block_of[p]] not in encoder.ids:
+                    work_queue.append(block_of[p])
+                result.add_transition(new_q, x_y_int, encoder.encode(merged[block_of[p]]))
+        result.set_state_count(len(encoder))
+        return result
+
+    def size(self):
+        """
+        :return: the number of states (with a transition, initial or final) and the number of transitions
+        """
+        states = set(self.initial_states) | set(self.final_states)
+        transitions = 0
+        for q in self.state_iterator():
+            states.add(q)
+            for (_, p) in self.get_transitions(q):
+                states.add(p)
+                transitions += 1
+        return len(states), transitions
+
+    def trim(self):
+        """
+        Removes duplicate transitions and all states that are not reachable from an initial state or from which no final
+        state is reachable. The states keep their numbers and the transitions their order
+        :return: the trimmed transducer
+        """
+        transitions = {}  # maps a state to its transitions without duplicates
+        for q in self.state_iterator():
+            transitions[q] = list(dict.fromkeys(self.get_transitions(q)))
+
+        reachable = set(self.initial_states)
+        work_queue = deque(self.initial_states)
+        while work_queue:
+            for (_, p) in transitions.get(work_queue.popleft(), []):
+                if p not in reachable:
+                    reachable.add(p)
+                    work_queue.append(p)
+        predecessors = {}
+        for q in reachable:
+            for (_, p) in transitions.get(q, []):
+                predecessors.setdefault(p, []).append(q)
+        useful = {q for q in self.final_states if q in reachable}
+        work_queue = deque(useful)
+        while work_queue:
+            for q in predecessors.get(work_queue.popleft(), []):
+                if q not in useful:
+                    useful.add(q)
+                    work_queue.append(q)
+
+        result = NFATransducer(self.alphabet_map)
+        result.set_state_count(self.state_count)
+        result.state_encoder = self.state_encoder
+        result.add_initial_state_list(self.initial_states)  # kept even if they are useless, oneshot starts from them
+        result.add_final_state_list([q for q in self.final_states if q in useful])
+        for q in self.state_iterator():
+            if q in useful:
+                for (x_y_int, p) in transitions[q]:
+                    if p in useful:
+                        result.add_transition(q, x_y_int, p)
+        return result
 
-            for t in self.alphabet_map.sigma_x_sigma_iterator():
-                p_gen = filter(lambda x: x is not None, map(lambda q: self.get_successors(q, t), q_list))
-                p_list = list(set(chain.from_iterable(p_gen)))
-                if p_list:
-                    new_p = hash_state(p_list)
-                    if p_list not in visited:
-                        work_queue.append(p_list)
-                        visited.append(p_list)
-                    result.add_transition(new_q, t, new_p)
+    def merge_bisimilar_states(self):
+        """
+        Merges forward bisimilar states: states that agree on being final and, for every symbol, reach the same classes
+        of states. The classes are refined until they are stable, every class is replaced by its smallest state
+        :return: the transducer with one state per class
+        """
+        states = sorted(set(self.state_iterator()) | {p for q in self.state_iterator() for (_, p) in
+                                                      self.get_transitions(q)} | set(self.initial_states))
+        block_of = {q: int(self.is_final_state(q)) for q in states}
+        blocks = len(set(block_of.values()))
+        while True:
+            signatures = {}
+            refined = {q: signatures.setdefault((block_of[q], frozenset((x_y_int, block_of[p]) for (x_y_int, p) in
+                                                                         self.get_transitions(q))), len(signatures))
+                       for q in states}
+            (block_of, stable) = (refined, len(signatures) == blocks)
+            blocks = len(signatures)
+            if stable:
+                break
+
+        representative = {}
+        for q in states:
+            representative.setdefault(block_of[q], q)
+        merged = {q: representative[block_of[q]] for q in states}
+
+        result = NFATransducer(self.alphabet_map)
+        result.set_state_count(self.state_count)
+        result.state_encoder = self.state_encoder
+        result.add_initial_state_list(list(dict.fromkeys(merged[q] for q in self.initial_states)))
+        result.add_final_state_list([q for q in self.final_states if merged[q] == q])
+        for q in self.state_iterator():
+            if merged[q] == q:
+                for (x_y_int, p) in dict.fromkeys((x_y_int, merged[p]) for (x_y_int, p) in self.get_transitions(q)):
+                    result.add_transition(q, x_y_int, p)
         return result
 
+    def reduce(self):
+        """
+        The reduction pipeline: trim the transducer (see trim) and merge its bisimilar states. Both keep the language of
+        the transducer, but every removed state of T also removes the columns that contain it from the step game
+        :return: the reduced transducer and a report [(stage, number of states, number of transitions)] that starts
+        with the original transducer
+        """
+        report = [("original", *self.size())]
+        trimmed = self.trim()
+        report.append(("trimmed", *trimmed.size()))
+        result = trimmed.merge_bisimilar_states()
+        report.append(("merged", *result.size()))
+        return result, report
+
+
+def report_to_str(report):
+    """
+    :param report: a report of NFATransducer.reduce
+    :return: the report in one line, e.g. "original 6/59 -> trimmed 6/56 -> merged 5/47" (states/transitions)
+    """
+    return " -> ".join(f'{stage} {states}/{transitions}' for (stage, states, transitions) in report)
+
 
 def parse_transition_regex(regex, alph_map, id):
     """
@@ -241,6 +500,246 @@ def parse_transition_regex_dfa(trans_dict, alph_map):
     return transitions
 
 
+def index_transitions(transitions):
+    """
+    :param transitions: A list of NFA transitions (q, x, p)
+    :return: A dictionary q -> x -> list of all p, without duplicate transitions
+    """
+    index = {}
+    for (q, x, p) in transitions:
+        targets = index.setdefault(q, {}).setdefault(x, [])
+        if p not in targets:
+            targets.append(p)
+    return index
+
+
+def co_reachable_states(index, final_states):
+    """
+    :param index: the transitions of an NFA as a dictionary q -> x -> list of all p (see index_transitions)
+    :param final_states: the final states of the NFA
+    :return: the set of states of the NFA from which a final state is reachable
+    """
+    predecessors = {}
+    for (q, q_index) in index.items():
+        for targets in q_index.values():
+            for p in targets:
+                predecessors.setdefault(p, set()).add(q)
+    co_reachable = set(final_states)
+    work_queue = deque(co_reachable)
+    while work_queue:
+        for q in predecessors.get(work_queue.popleft(), ()):
+            if q not in co_reachable:
+                co_reachable.add(q)
+                work_queue.append(q)
+    return co_reachable
+
+
+class LazyPairing:
+    """
+    A view of the pairing IxB of two NFAs that computes the transitions of a pair from the NFAs when they are first
+    asked for and memoizes them. A search that only reaches a few pairs does not pay for the whole product.
+    The pairs are encoded like the states of RTS.pair_transducers. Pairs whose NFA states cannot reach a final state of
+    their NFA are left out, but unlike the eager pairing a pair whose states only reach final states separately is kept
+    (no final pair is reachable from it). It implements the methods of a transducer used by oneshot and by
+    Pruning.BackwardPruning: state_iterator, get_final_states and the partial alphabets explore all pairs once and
+    answer like the eager pairing, minimize and reduce build the eager pairing
+    """
+
+    def __init__(self, rts, q0, p0, t1, t2, f1, f2):
+        """
+        :param rts: the RTS that builds the eager pairing
+        The remaining parameters are the ones of RTS.pair_transducers
+        """
+        self.rts = rts
+        self.pairing = (q0, p0, t1, t2, f1, f2)
+        self.alphabet_map = rts.alphabet_map
+        n1 = 1 + max(chain([q0], f1, chain.from_iterable((q, p) for (q, _, p) in t1)))
+        n2 = 1 + max(chain([p0], f2, chain.from_iterable((q, p) for (q, _, p) in t2)))
+        self.state_encoder = Storage.StateEncoder([n1, n2])
+        self.index1, self.index2 = index_transitions(t1), index_transitions(t2)
+        self.f1, self.f2 = set(f1), set(f2)
+        self.alive1 = co_reachable_states(self.index1, f1)
+        self.alive2 = co_reachable_states(self.index2, f2)
+        self.initial_states = [self.state_encoder.encode([q0, p0])]
+        self.transitions = {}  # maps a paired state to the list of its transitions (x_y_int, paired state)
+        self.live_states = None  # the reachable pairs from which a final pair is reachable, explored on first use
+        self.eager = None  # the eager pairing, built on first use
+
+    def get_initial_states(self):
+        return self.initial_states
+
+    def get_alphabet_map(self):
+        return self.alphabet_map
+
+    def is_final_state(self, state):
+        (q1, q2) = self.state_encoder.decode(state)
+        return q1 in self.f1 and q2 in self.f2
+
+    def get_transitions(self, origin):
+        """
+        :param origin: a paired state
+        :return: the transitions ([x,y], paired state) of origin, computed on the first call
+        """
+        transitions = self.transitions.get(origin)
+        if transitions is None:
+            (q1, q2) = self.state_encoder.decode(origin)
+            transitions = []
+            for (x, targets1) in self.index1.get(q1, {}).items():
+                for (y, targets2) in self.index2.get(q2, {}).items():
+                    x_y_int = self.alphabet_map.combine_x_and_y(x, y)
+                    for p1 in targets1:
+                        for p2 in targets2:
+                            if p1 in self.alive1 and p2 in self.alive2:
+                                transitions.append((x_y_int, self.state_encoder.encode([p1, p2])))
+            self.transitions[origin] = transitions
+        return iter(transitions)
+
+    def explore(self):
+        """
+        :return: the pairs that are reachable from the initial pair and from which a final pair is reachable, like the
+        states of the eager pairing (see RTS.pair_transducers)
+        """
+        if self.live_states is None:
+            reachable = list(self.initial_states)
+            predecessors = {state: [] for state in reachable}
+            for state in reachable:  # reachable grows while it is iterated, a bfs
+                for (_, target) in self.get_transitions(state):
+                    if target not in predecessors:
+                        predecessors[target] = []
+                        reachable.append(target)
+                    predecessors[target].append(state)
+            co_reachable = {state for state in reachable if self.is_final_state(state)}
+            work_list = list(co_reachable)
+            while work_list:
+                for state in predecessors[work_list.pop()]:
+                    if state not in co_reachable:
+                        co_reachable.add(state)
+                        work_list.append(state)
+            self.live_states = [state for state in reachable if state in co_reachable]
+        return self.live_states
+
+    def state_iterator(self):
+        return iter(self.explore())
+
+    def get_final_states(self):
+        return [state for state in self.explore() if self.is_final_state(state)]
+
+    def live_symbols(self, get_symbol):
+        """
+        :param get_symbol: AlphabetMap.get_x or AlphabetMap.get_y
+        :return: the symbols of all transitions between live pairs
+        """
+        live = set(self.explore())
+        return {get_symbol(x_y_int) for state in live for (x_y_int, target) in self.get_transitions(state)
+                if target in live}
+
+    @property
+    def partial_sigma_origin(self):
+        return self.live_symbols(self.alphabet_map.get_x)
+
+    @property
+    def partial_sigma_target(self):
+        return self.live_symbols(self.alphabet_map.get_y)
+
+    def minimize(self):
+        return self.materialize().minimize()
+
+    def reduce(self):
+        return self.materialize().reduce()
+
+    def materialize(self):
+        """
+        :return: the eager pairing of the NFAs (see RTS.pair_transducers)
+        """
+        if self.eager is None:
+            self.eager = self.rts.pair_transducers(*self.pairing)
+        return self.eager
+
+
+class MultiPairing:
+    """
+    The pairing of I with all property NFAs B_1, ..., B_n of an RTS at once. A state is a state i of I together with the
+    set of the states (k, b) of the properties B_k that are reachable with the same pair of words, i.e. the pairing of I
+    with the subset construction of the disjoint union of all B_k. The step game of a transition only depends on its
+    symbols, so one exploration serves all properties: a state is final for B_k, if i is final in I and a final state
+    of B_k is in its set. The states are built on the fly and get dense ids, states of I or B that cannot reach a final
+    state are left out
+    """
+
+    def __init__(self, alphabet_map, I, B_dict):
+        """
+        :param alphabet_map: the alphabet map of the RTS
+        :param I: the id transducer of the NFA I
+        :param B_dict: maps the name of every property to the id transducer of its NFA B
+        """
+        self.alphabet_map = alphabet_map
+        self.properties = list(B_dict)  # the name of B_k is properties[k]
+        B_list = list(B_dict.values())
+        (self.index_I, self.final_I) = self.index(I)
+        self.indices = [self.index(B) for B in B_list]  # the index and the final states of every B_k
+        self.state_encoder = Storage.DenseEncoder()  # maps the id of a state to (i, ((k, b), ...))
+        self.transitions = {}  # maps a state to the list of its transitions (x_y_int, state), built on first use
+        initial = tuple(sorted((k, b) for (k, B) in enumerate(B_list) for b in B.get_initial_states()
+                               if b in self.indices[k][1][1]))
+        self.initial_states = [self.state_encoder.encode((q, initial)) for q in I.get_initial_states()]
+
+    def index(self, nfa):
+        """
+        :param nfa: the id transducer of an NFA
+        :return: the transitions of the NFA as a dictionary q -> x -> list of all p and (the final states, the states
+        from which a final state is reachable)
+        """
+        index = index_transitions([(q, self.alphabet_map.get_x(x_x_int), p) for q in nfa.state_iterator()
+                                   for (x_x_int, p) in nfa.get_transitions(q)])
+        return index, (set(nfa.get_final_states()), co_reachable_states(index, nfa.get_final_states()))
+
+    def get_initial_states(self):
+        return self.initial_states
+
+    def get_alphabet_map(self):
+        return self.alphabet_map
+
+    def final_properties(self, state):
+        """
+        :param state: the id of a state
+        :return: the names of all properties for which the state is final
+        """
+        (q, subset) = self.state_encoder.decode(state)
+        if q not in self.final_I[0]:
+            return []
+        return [self.properties[k] for k in sorted({k for (k, b) in subset if b in self.indices[k][1][0]})]
+
+    def get_transitions(self, origin):
+        """
+        :param origin: the id of a state
+        :return: the transitions ([x,y], state) of origin, computed on the first call
+        """
+        transitions = self.transitions.get(origin)
+        if transitions is None:
+            (q, subset) = self.state_encoder.decode(origin)
+            transitions = []
+            for (x, targets) in self.index_I.get(q, {}).items():
+                targets = [p for p in targets if p in self.final_I[1]]
+                if not targets:
+                    continue
+                successors = {}  # maps y to the set of the successors (k, b') of the subset
+                for (k, b) in subset:
+                    for (y, b_targets) in self.indices[k][0].get(b, {}).items():
+                        successors.setdefault(y, set()).update((k, b_) for b_ in b_targets
+                                                               if b_ in self.indices[k][1][1])
+                for y in sorted(successors):
+                    if successors[y]:
+                        subset_ = tuple(sorted(successors[y]))
+                        for p in targets:
+                            transitions.append((self.alphabet_map.combine_x_and_y(x, y),
+                                                self.state_encoder.encode((p, subset_))))
+            self.transitions[origin] = transitions
+        return iter(transitions)
+
+    def __len__(self):
+        return len(self.state_encoder)
+
+
 class RTS:
     """
     A Regular transition system (RTS) is a triple <Sigma,T,I>. Sigma is an alphabet T is a transducer over that alphabet
@@ -249,16 +748,21 @@ class RTS:
     - T encodes transitions of the system.
     For more information on RTS refer to my thesis
     """
-    def __init__(self, filename):
+    def __init__(self, filename=None, lazy_pairing=False):
         """
-        :param filename: File in which transducer is specified
+        :param filename: File in which transducer is specified. If None, an empty RTS is created which is filled by
+        the caller (e.g. ModelCache when loading a compiled RTS)
+        :param lazy_pairing: if true the pairings IxB are LazyPairing views that are built during the search
         """
         self.IxB_dict = None  # Dictionary of all pairings of I and B
         self.B_dict = None  # dictionary of all bad word NFA's (refer to my thesis)
         self.I = None  # A transducer encoding the transitions of the system
         self.T = None  # A NFA encoding the initial configurations
         self.alphabet_map = None  # The alphabet_map for the RTS
-        self.rts_from_json(filename)  # Initialize the RTS
+        self.timings = {}  # The duration of parsing the .json file and of pairing I and B in seconds (0 if compiled)
+        self.lazy_pairing = lazy_pairing  # build the pairings IxB on the fly (see LazyPairing)
+        if filename is not None:
+            self.rts_from_json(filename)  # Initialize the RTS
 
     def get_I(self):
         return self.I
@@ -272,6 +776,13 @@ class RTS:
     def get_IxB(self, property_name):
         return self.IxB_dict[property_name]
 
+    def get_multi_pairing(self, property_names):
+        """
+        :param property_names: the names of properties of the RTS
+        :return: the MultiPairing of I with the NFAs B of all properties in property_names (in this order)
+        """
+        return MultiPairing(self.alphabet_map, self.I, {name: self.B_dict[name] for name in property_names})
+
     def rts_from_json(self, filename):
         """
         Initializes the RTS by:
@@ -280,6 +791,7 @@ class RTS:
         resulting in a list of transducer IxB (with I and B specified in filename).
         :param filename: The file where the rts specifications are stored
         """
+        start_time = time.perf_counter()
         file = open(f'benchmark/{filename}')
         rts_dict = json.load(file)
         alphabet_map = Storage.AlphabetMap(rts_dict["alphabet"])
@@ -294,9 +806,11 @@ class RTS:
 
         self.B_dict = {name: self.build_transducer(properties_dict[name], True) for name in
                        properties_dict}
+        pairing_time = time.perf_counter()
 
         self.IxB_dict = {name: self.build_IxB_transducer(initial_dict, properties_dict[name]) for name in
                          properties_dict}
+        self.timings = {"parse": pairing_time - start_time, "pairing": time.perf_counter() - pairing_time}
 
     def pair_transducers(self, q0, p0, t1, t2, f1, f2):
         """
@@ -307,32 +821,60 @@ class RTS:
         :param t2: the transition relation the second NFA B as a list
         :param f1: list of final states of the first NFA A
         :param f2: list of final states of the second NFA B
-        :return: the pairing AxB of the two NFAs
-        """
+        :return: the pairing AxB of the two NFAs, restricted to the pairs that are reachable from (q0, p0) and from
+        which a final pair is reachable
+        """
+        # the number of states of A and B, such that the states (q, p) of AxB are encoded collision free
+        n1 = 1 + max(chain([q0], f1, chain.from_iterable((q, p) for (q, _, p) in t1)))
+        n2 = 1 + max(chain([p0], f2, chain.from_iterable((q, p) for (q, _, p) in t2)))
+        encoder = Storage.StateEncoder([n1, n2])
+
+        index1, index2 = index_transitions(t1), index_transitions(t2)
+        f1, f2 = set(f1), set(f2)
+
+        # 1.) Explore all pairs reachable from (q0, p0)
+        successors = {(q0, p0): None}  # maps a reachable pair to the list of its transitions ([x,y], pair)
+        work_queue = deque([(q0, p0)])
+        while work_queue:
+            (q1, q2) = work_queue.popleft()
+            transitions = []
+            for (x, targets1) in index1.get(q1, {}).items():
+                for (y, targets2) in index2.get(q2, {}).items():
+                    x_y_int = self.alphabet_map.combine_x_and_y(x, y)
+                    for p1 in targets1:
+                        for p2 in targets2:
+                            transitions.append((x_y_int, (p1, p2)))
+                            if (p1, p2) not in successors:
+                                successors[(p1, p2)] = None
+                                work_queue.append((p1, p2))
+            successors[(q1, q2)] = transitions
+
+        # 2.) Keep only the pairs from which a final pair (q, p) with q in f1 and p in f2 is reachable
+        predecessors = {}
+        for (pair, transitions) in successors.items():
+            for (_, target) in transitions:
+                predecessors.setdefault(target, []).append(pair)
+        co_reachable = {pair for pair in successors if pair[0] in f1 and pair[1] in f2}
+        work_queue = deque(co_reachable)
+        while work_queue:
+            for pair in predecessors.get(work_queue.popleft(), []):
+                if pair not in co_reachable:
+                    co_reachable.add(pair)
+                    work_queue.append(pair)
+
+        # 3.) Build the pairing from all reachable and co-reachable pairs
         result = NFATransducer(self.alphabet_map)
-        result.add_initial_state(hash_state([q0, p0]))
-
-        Q = [(q0, p0)]
-        W = []
-
-        while len(Q) != 0:
-            (q1, q2) = Q.pop(0)
-            W.append((q1, q2))
-
-            if q1 in f1 and q2 in f2:
-                result.add_final_state(hash_state([q1, q2]))
-
-            for (q1_, x, p1) in t1:
-                for (q2_, y, p2) in t2:
-                    if q1 == q1_ and q2 == q2_:
-                        q1_q2_hash = hash_state([q1_, q2_])
-                        p1p2hash = hash_state([p1, p2])
-                        x_y_int = self.alphabet_map.combine_x_and_y(x, y)
-                        if result.get_successors(q1_q2_hash, x_y_int) is None or p1p2hash not in result.get_successors(
-                                q1_q2_hash, x_y_int):
-                            result.add_transition(q1_q2_hash, x_y_int, p1p2hash)
-                        if (p1, p2) not in W:
-                            Q.append((p1, p2))
+        result.state_encoder = encoder
+        result.add_initial_state(encoder.encode([q0, p0]))
+        for (pair, transitions) in successors.items():
+            if pair not in co_reachable:
+                continue
+            q1_q2_hash = encoder.encode(pair)
+            if pair[0] in f1 and pair[1] in f2:
+                result.add_final_state(q1_q2_hash)
+            for (x_y_int, target) in transitions:
+                if target in co_reachable:
+                    result.add_transition(q1_q2_hash, x_y_int, encoder.encode(target))
         return result
 
     def build_IxB_transducer(self, I_dict, B_dict):
@@ -340,7 +882,7 @@ class RTS:
         Performs the pairing of two NFAs with the .json specification as input
         :param I_dict: transitions of the first NFA
         :param B_dict: transitions of the second NFA
-        :return: the pairing transducer IxB
+        :return: the pairing transducer IxB, a LazyPairing if lazy_pairing is set
         """
         t1 = parse_transition_regex_dfa(I_dict["transitions"], self.alphabet_map)
         f1 = list(map(lambda q: int(q[1:]), I_dict["acceptingStates"]))
@@ -351,6 +893,8 @@ class RTS:
         q0 = int(I_dict["initialState"][1:])
         p0 = int(B_dict["initialState"][1:])
 
+        if self.lazy_pairing:
+            return LazyPairing(self, q0, p0, t1, t2, f1, f2)
         return self.pair_transducers(q0, p0, t1, t2, f1, f2)
 
     def built_id_transducer(self, nfa_dict):
@@ -0,0 +1,317 @@
+"""
+A long-running verification service for many small jobs. It keeps the loaded benchmarks and their step game caches in
+the memory of a bounded pool of worker processes, so a job does not pay for the start of python, the loading of the
+benchmark and a cold cache. Jobs are submitted over HTTP on localhost or on a Unix socket and answered asynchronously:
+
+    POST /jobs          a job or a list of jobs (see Runner.execute_job), returns their ids
+    GET  /jobs/<id>     the state of a job and its record when it is finished, ?wait=<seconds> waits for the record
+    GET  /status        the number of workers, queued and finished jobs
+"""
+import Main
+import ModelCache
+import Results
+import Runner
+import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import signal
+import socketserver
+import threading
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import resource  # not available on every platform, memory limits are ignored without it
+except ImportError:
+    resource = None
+
+models = None  # the Runner.JobModels object of a worker process, it keeps the benchmarks and caches across jobs
+
+
+def init_worker(benchmark_names, memory_limit):
+    """
+    The initializer of a worker process, loads the benchmarks before the first job arrives
+    :param benchmark_names: the benchmark files that are loaded up front
+    :param memory_limit: the maximal address space of the process in bytes, or None
+    """
+    global models
+    if memory_limit is not None and resource is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            pass  # e.g. macOS does not support limiting the address space
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the daemon shuts the pool down on Ctrl-C
+    models = Runner.JobModels()
+    for benchmark_name, testcases in Main.benchmarks:
+        if benchmark_name in benchmark_names:
+            for test in testcases:
+                models.get_transducers({"benchmark": benchmark_name, "property": test})
+
+
+def run_job(job, timeout):
+    """
+    Executes a job in a worker process with the models of the worker
+    :param job: the configuration of the job
+    :param timeout: the wall-clock limit of the job in seconds
+    :return: the record of the job, like Runner.job_worker
+    """
+
+    def timeout_handler(signum, frame):
+        raise Main.Timeout()
+
+    old_handler = signal.signal(signal.SIGALRM, timeout_handler)
+    signal.alarm(timeout)
+    try:
+        return Runner.execute_job(job, models)
+    except Main.Timeout:
+        models.discard_step_cache(job)
+        return Results.make_record(job, status="timeout", timings={"search": timeout})
+    except MemoryError:
+        models.discard_step_cache(job)
+        return Results.make_record(job, status="memout")
+    except Exception as e:
+        models.discard_step_cache(job)
+        record = Results.make_record(job, status="error")
+        record["error"] = repr(e)
+        return record
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def check_job(job):
+    """
+    :param job: a submitted job
+    :return: the reason why the job is rejected, or None if it can be executed
+    """
+    if not isinstance(job, dict):
+        return "a job is a json object"
+    missing = [field for field in Results.KEY_FIELDS if field not in job]
+    if missing:
+        return f'missing fields {missing}'
+    if not os.path.exists(f'benchmark/{job["benchmark"]}'):
+        return f'unknown benchmark {job["benchmark"]}'
+    if job["generator"] not in Main.gen_implementations:
+        return f'unknown generator {job["generator"]}'
+    if job["oneshot"] not in Main.oneshot_implementations or job["oneshot"] == "multi_disprove":
+        return f'unknown oneshot implementation {job["oneshot"]}'  # multi_disprove checks all properties at once
+    return None
+
+
+class Service:
+    """
+    The jobs of the daemon: submits them to the worker pool and keeps the records of the finished jobs
+    """
+
+    def __init__(self, workers, timeout, memory_limit, max_queue, keep, preload):
+        """
+        :param workers: the number of worker processes
+        :param timeout: the wall-clock limit of a job in seconds
+        :param memory_limit: the memory limit of a worker process in bytes, or None
+        :param max_queue: the maximal number of unfinished jobs, further jobs are rejected
+        :param keep: the number of finished jobs whose records are kept
+        :param preload: the benchmark files that every worker loads when it starts
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.keep = keep
+        self.pool_arguments = {"initializer": init_worker, "initargs": (preload, memory_limit)}
+        self.pool = ProcessPoolExecutor(workers, **self.pool_arguments)
+        self.lock = threading.RLock()  # the callback of a job may run in submit
+        self.next_id = 0
+        self.jobs = OrderedDict()  # maps the id of a job to (job, future)
+        self.finished_ids = deque()  # the ids of the kept finished jobs in the order in which they finished
+        self.pool_futures = set()  # the unfinished futures of the current pool
+        self.finished = 0
+
+    def submit(self, jobs):
+        """
+        :param jobs: a list of jobs
+        :return: the ids of the jobs, or None if the queue has no room for them
+        """
+        with self.lock:
+            if self.unfinished() + len(jobs) > self.max_queue:
+                return None
+            ids = []
+            for job in jobs:
+                self.next_id += 1
+                try:
+                    future = self.pool.submit(run_job, job, self.timeout)
+                except BrokenProcessPool:
+                    self.replace_pool()
+                    future = self.pool.submit(run_job, job, self.timeout)
+                self.jobs[self.next_id] = (job, future)
+                self.pool_futures.add(future)
+                future.add_done_callback(functools.partial(self.job_done, self.next_id))
+                ids.append(self.next_id)
+            return ids
+
+    def replace_pool(self):
+        """
+        Replaces a broken pool, a worker died, e.g. it was killed by the OS. The unfinished jobs of the broken pool
+        fail and are reported as crashed
+        """
+        self.pool.shutdown(wait=False)
+        self.pool = ProcessPoolExecutor(self.workers, **self.pool_arguments)
+        self.pool_futures = set()
+
+    def job_done(self, job_id, future):
+        """
+        :param job_id: the id of the finished job
+        :param future: the future of the job
+        """
+        with self.lock:
+            self.finished += 1
+            if future in self.pool_futures:
+                self.pool_futures.discard(future)
+                if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                    self.replace_pool()  # the following jobs are submitted to a new pool
+            self.finished_ids.append(job_id)
+            while len(self.finished_ids) > self.keep:  # forget the oldest finished jobs
+                self.jobs.pop(self.finished_ids.popleft(), None)
+
+    def unfinished(self):
+        return sum(1 for (_, future) in self.jobs.values() if not future.done())
+
+    def state(self, job_id, wait=0.0):
+        """
+        :param job_id: the id of a job
+        :param wait: the number of seconds to wait for the record of an unfinished job
+        :return: the state of the job and its record when it is finished, or None for an unknown job
+        """
+        with self.lock:
+            entry = self.jobs.get(job_id)
+        if entry is None:
+            return None
+        (job, future) = entry
+        if wait > 0:
+            concurrent.futures.wait([future], timeout=wait)
+        if not future.done():
+            return {"id": job_id, "state": "running" if future.running() else "queued", "job": job}
+        try:
+            record = future.result()
+        except Exception as e:  # e.g. the worker process was killed
+            record = Results.make_record(job, status="crashed")
+            record["error"] = repr(e)
+        return {"id": job_id, "state": "finished", "job": job, "record": record}
+
+    def status(self):
+        with self.lock:
+            return {"workers": self.workers, "unfinished": self.unfinished(), "finished": self.finished}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Translates the HTTP requests to the Service of the server
+    """
+
+    def send_json(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            return self.send_json(404, {"error": "unknown path"})
+        try:
+            jobs = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            return self.send_json(400, {"error": "the body is not json"})
+        jobs = jobs if isinstance(jobs, list) else [jobs]
+        for job in jobs:
+            reason = check_job(job)
+            if reason is not None:
+                return self.send_json(400, {"error": reason, "job": job})
+        ids = self.server.service.submit(jobs)
+        if ids is None:
+            return self.send_json(503, {"error": "too many unfinished jobs"})
+        self.send_json(202, {"ids": ids})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            return self.send_json(200, self.server.service.status())
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "jobs" or not parts[1].isdigit():
+            return self.send_json(404, {"error": "unknown path"})
+        try:
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+        except ValueError:
+            return self.send_json(400, {"error": "wait is not a number"})
+        state = self.server.service.state(int(parts[1]), wait)
+        if state is None:
+            return self.send_json(404, {"error": "unknown job"})
+        self.send_json(200, state)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"  # a Unix socket has no client address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """
+    An HTTP server on a Unix socket, e.g. for curl --unix-socket
+    """
+
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)  # the socket of a previous daemon
+        super().server_bind()
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+"""Start the daemon"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Answers verification jobs with warm benchmarks and caches")
+    parser.add_argument("--port", type=int, default=8642, help="port of the HTTP server on localhost")
+    parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of a port")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: #cpus)")
+    parser.add_argument("--timeout", type=int, default=Main.max_time, help="wall-clock limit per job in seconds")
+    parser.add_argument("--memory", type=int, default=None, help="memory limit per worker in MB")
+    parser.add_argument("--max-queue", type=int, default=10000, help="maximal number of unfinished jobs")
+    parser.add_argument("--keep", type=int, default=10000, help="number of finished jobs whose records are kept")
+    parser.add_argument("--preload", nargs="*", default=None,
+                        help="benchmark files that the workers load when they start (default: all benchmarks)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    preload = [name for (name, _) in Main.benchmarks] if args.preload is None else args.preload
+    for benchmark_name in preload:
+        ModelCache.load_rts(benchmark_name)  # compile once before the workers load the benchmarks concurrently
+    workers = args.workers or os.cpu_count() or 1
+    service = Service(workers, args.timeout, None if args.memory is None else args.memory * 1024 * 1024,
+                      args.max_queue, args.keep, preload)
+    if args.socket is not None:
+        server = UnixHTTPServer(args.socket, RequestHandler)
+        address = args.socket
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), RequestHandler)
+        address = f'http://127.0.0.1:{args.port}'
+    server.service = service
+    server.verbose = args.verbose
+    print(f'Listening on {address} with {workers} workers', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
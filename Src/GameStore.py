@@ -0,0 +1,118 @@
+"""Persists played step games on disk, so that later runs on the same transducer T can replay them"""
+import hashlib
+import json
+import os
+import sqlite3
+
+STORE_VERSION = 2  # increase when the step games or the layout of the store change
+COMMIT_INTERVAL = 10000  # number of new games after which they are committed to the database
+
+
+def transducer_hash(T):
+    """
+    :param T: a transducer
+    :return: a hash of the alphabet, the initial and final states and the transitions of T. It does not depend on the
+    storage of T, e.g. T loaded from a .json file and from a compiled file have the same hash
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([STORE_VERSION, T.get_alphabet_map().sigma, sorted(T.get_initial_states()),
+                              sorted(T.get_final_states())]).encode())
+    for q in sorted(T.state_iterator()):
+        digest.update(json.dumps([q, sorted(T.get_transitions(q))]).encode())
+    return digest.hexdigest()
+
+
+def variant(gen_name, ignore_ambiguous, oneshot_name):
+    """
+    :return: the variant of the games played by a oneshot run (see StepGameStore). multi_disprove only caches the
+    columns won below a position of the step game (see Algorithms.OneshotSmart.multi_disprove_oneshot), so its games
+    are kept apart from the complete games of the other implementations
+    """
+    subtree = "subtree" if oneshot_name == "multi_disprove" else "complete"
+    return f'{gen_name}/{ignore_ambiguous}/{subtree}'
+
+
+def game_key(c, l, I, v, d_current):
+    """
+    :param c: the from-column (tuple of states of T)
+    :param d_current: the to-column (tuple of states of T)
+    :return: the key of the game <l, I, d_current> in the store
+    """
+    return f'{",".join(map(str, c))}|{l}|{I}|{v}|{",".join(map(str, d_current))}'
+
+
+class StepGameStore:
+    """
+    A sqlite database of step games. The games of a transducer T are kept in their own namespace, which consists of the
+    hash of T and a variant (e.g. the generator function), as the games also depend on the way they are played.
+    Columns are stored as tuples of states of T instead of the ids of a ColumnTable, which are only valid in one run.
+    The winning columns of a game in the initial game state are the successors of the from-column, so a warm store
+    also answers the column successors of oneshot.
+    """
+
+    def __init__(self, path, T, variant=""):
+        """
+        :param path: the path of the database, it is created if it does not exist
+        :param T: the transition transducer T of the games
+        :param variant: distinguishes games of T that are played differently, e.g. "buffer_bfs/True/complete" (see
+        variant)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)  # several benchmark processes may use the same store
+        self.connection.execute("CREATE TABLE IF NOT EXISTS step_games (namespace TEXT NOT NULL, game TEXT NOT NULL, "
+                                "winning TEXT NOT NULL, PRIMARY KEY (namespace, game))")
+        self.namespace = f'{transducer_hash(T)}/{variant}'
+        self.pending = {}  # maps the key of a new game to its winning columns until it is committed
+        # a cold start does not query the database until the first commit, the games of this run are found in pending
+        self.cold = self.connection.execute("SELECT 1 FROM step_games WHERE namespace = ? LIMIT 1",
+                                            (self.namespace,)).fetchone() is None
+        self.loads = 0  # number of games that were found in the store
+
+    def load(self, c, l, I, v, d_current):
+        """
+        :return: the winning columns (tuples of states) of the game, or None if the game is not in the store
+        """
+        key = game_key(c, l, I, v, d_current)
+        winning = self.pending.get(key)
+        if winning is None:
+            if self.cold:
+                return None
+            row = self.connection.execute("SELECT winning FROM step_games WHERE namespace = ? AND game = ?",
+                                          (self.namespace, key)).fetchone()
+            if row is None:
+                return None
+            winning = row[0]
+        self.loads += 1
+        return [tuple(d) for d in json.loads(winning)]
+
+    def save(self, c, l, I, v, d_current, d_winning):
+        """
+        Adds a played game to the store, it is written on the next commit
+        :param d_winning: the winning columns (tuples of states) of the game
+        """
+        self.pending[game_key(c, l, I, v, d_current)] = json.dumps(d_winning)
+        if len(self.pending) >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Writes the pending games to the database"""
+        if self.pending:
+            with self.connection:
+                self.connection.executemany("INSERT OR IGNORE INTO step_games VALUES (?, ?, ?)",
+                                            [(self.namespace, key, winning) for (key, winning) in self.pending.items()])
+            self.pending = {}
+            self.cold = False  # the committed games are only found in the database
+
+    def __len__(self):
+        """
+        :return: the number of games of T in the store (including the pending ones)
+        """
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM step_games WHERE namespace = ?",
+                                           (self.namespace,)).fetchone()
+        return count + len(self.pending)
+
+    def close(self):
+        self.commit()
+        self.connection.close()
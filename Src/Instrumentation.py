@@ -0,0 +1,123 @@
+"""Opt-in instrumentation and profiling of oneshot runs. Runs without an Instrumentation object are not affected"""
+import cProfile
+from contextlib import contextmanager
+import functools
+import json
+import time
+import tracemalloc
+
+profilers = ("cprofile", "tracemalloc")
+
+
+class Instrumentation:
+    """
+    Collects the timings of the phases of a run (e.g. load, pairing, restriction, search), the number and depth of the
+    step game calls, the number of winning columns of each step game started by oneshot and a time series of the
+    explored states, the cache hits and misses and the size of the frontier
+    """
+
+    sample_interval = 100  # number of explored states between two samples of the time series
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.timings = {}  # maps a phase to its duration in seconds
+        self.nested = []  # the duration of the phases nested in each running phase
+        self.step_games = 0  # number of played (not cached) step games
+        self.depths = {}  # maps the depth of a step game (0 for the games started by oneshot) to the number of games
+        self.winning_columns = {}  # maps a number of winning columns d to the number of games started by oneshot
+        self.samples = []  # (time, explored states, cache hits, cache misses, frontier size)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the duration of a phase, phases with the same name are summed up. The duration of a phase that runs
+        within another phase (e.g. the restriction of T in the search) is not counted for the outer phase
+        :param name: the name of the phase
+        """
+        start = time.perf_counter()
+        self.nested.append(0.0)
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + duration - self.nested.pop()
+            if self.nested:
+                self.nested[-1] += duration
+
+    def step_game(self, depth):
+        """
+        Called for every played step game
+        :param depth: the number of partially played games below it
+        """
+        self.step_games += 1
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+
+    def game_finished(self, wins):
+        """
+        Called after oneshot received all winning columns of a step game
+        :param wins: the number of winning columns
+        """
+        self.winning_columns[wins] = self.winning_columns.get(wins, 0) + 1
+
+    def sample(self, o, frontier):
+        """
+        Adds a sample to the time series
+        :param o: the OneshotSmart object of the run
+        :param frontier: the number of states that wait to be expanded (work set of the bfs, stack of the dfs)
+        """
+        counters = o.step_cache.counters()
+        self.samples.append((round(time.perf_counter() - self.start_time, 6), o.expl_states,
+                             counters["cache_hits"] - o.cache_baseline["cache_hits"],
+                             counters["cache_misses"] - o.cache_baseline["cache_misses"], frontier))
+
+    def to_dict(self):
+        """
+        :return: all collected data as a .json compatible dictionary
+        """
+        return {"timings": self.timings,
+                "step_games": self.step_games,
+                "depths": {str(depth): self.depths[depth] for depth in sorted(self.depths)},
+                "winning_columns": {str(wins): self.winning_columns[wins] for wins in sorted(self.winning_columns)},
+                "samples": self.samples}
+
+    def write(self, path, run):
+        """
+        Appends the collected data as one line to the file path
+        :param run: the configuration of the run (e.g. benchmark, property, generator), stored with the data
+        """
+        with open(path, 'a') as file:
+            file.write(json.dumps(dict(run, **self.to_dict())) + "\n")
+
+
+def profiled(function, profiler, path):
+    """
+    :param function: the function to be profiled
+    :param profiler: "cprofile" or "tracemalloc"
+    :param path: the file the profile is written to. cProfile writes pstats data (see python -m pstats),
+    tracemalloc the peak memory and the lines with the largest allocations
+    :return: a function that runs function with the profiler
+    """
+    if profiler not in profilers:
+        raise ValueError(f'Unknown profiler "{profiler}", use one of {profilers}')
+
+    @functools.wraps(function)
+    def wrapper(*args):
+        if profiler == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(function, *args)
+            finally:  # also write the profile of a run that timed out
+                profile.dump_stats(path)
+        tracemalloc.start()
+        try:
+            return function(*args)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            (_, peak) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(path, 'w') as file:
+                file.write(f'peak: {peak} bytes\n')
+                for statistic in snapshot.statistics("lineno")[:50]:
+                    file.write(f'{statistic}\n')
+
+    return wrapper
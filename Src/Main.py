@@ -2,6 +2,12 @@ import time
 import signal
 import Algorithms
 import Automata
+import GameStore
+import Instrumentation
+import ModelCache
+import Results
+import Storage
+import Util
 
 benchmarks = [
     ("Burns.json", ["nomutex"]),
@@ -18,10 +24,24 @@ benchmarks = [
 gen_implementations = {"buffer_bfs": Algorithms.OneshotSmart.step_game_gen_buffered_bfs,
                        "simple_dfs": Algorithms.OneshotSmart.step_game_gen_simple_dfs,
                        "buffer_dfs": Algorithms.OneshotSmart.step_game_gen_cached_dfs}
-oneshot_implementations = {"multi_disprove",
-                           "min_disprove",
-                           "dfs",
-                           "bfs"}
+oneshot_implementations = {"multi_disprove": "multi_disprove_oneshot",  # maps names to methods of OneshotSmart
+                           "min_disprove": "min_sigma_disprove_oneshot",
+                           "dfs": "oneshot_dfs",
+                           "bfs": "oneshot_bfs"}
+storage_implementations = {"simple": lambda alphabet_map: Storage.SimpleStorageNFA(),  # storages of T by name
+                           "numpy": Storage.NumpyStorageNFA}
+
+# All configurations (generator, oneshot implementation, ignore ambiguous) that are benchmarked
+configurations = [("buffer_bfs", "bfs", True),
+                  ("buffer_bfs", "bfs", False),
+                  ("buffer_bfs", "dfs", False),
+                  ("buffer_dfs", "bfs", False),
+                  ("buffer_dfs", "dfs", False),
+                  ("buffer_bfs", "dfs", True),
+                  ("buffer_dfs", "bfs", True),
+                  ("buffer_dfs", "dfs", True),
+                  ("buffer_bfs", "min_disprove", True),
+                  ("buffer_dfs", "min_disprove", True)]
 
 max_time = 20 * 60  # max time in seconds until execution of oneshot implementation is considered as timed out
 
@@ -38,6 +58,7 @@ def try_one(o, oneshot_func, timeout_time, gen_imp):
     :param oneshot_func: the oneshot implementation under test
     :param timeout_time: the time after which the one_shot func is considered as timed out
     :param gen_imp: the implementation for the generator function necessary for oneshot_func
+    :return: the status ("done" or "timeout") and the return value of oneshot_func
     """
 
     def timeout_handler(signum, frame):
@@ -48,22 +69,49 @@ def try_one(o, oneshot_func, timeout_time, gen_imp):
 
     try:
         result = oneshot_func(gen_imp)
+        signal.alarm(0)
         o.print_oneshot_result(result)
+        return "done", result
 
     except Timeout:
         print('{} timed out after {} seconds'.format(oneshot_func.__name__, timeout_time))
-        return None
+        return "timeout", None
     finally:
         signal.signal(signal.SIGALRM, old_handler)
 
 
-def execute_benchmarks(benchmark_list, gen_name, oneshot_name, ignore_ambiguous):
+def execute_benchmarks(benchmark_list, gen_name, oneshot_name, ignore_ambiguous, minimize=False, output=None,
+                       share_cache=True, cache_capacity=None, cache_policy="lru", store=None, backward_pruning=False,
+                       storage=None, instrument=None, profile=None, visited_mode="exact", bitstate_bytes=None,
+                       error_bound=None, reduce=False, lazy_pairing=False):
     """
     Executes the benchmarks in benchmark_list for a oneshot implementation
     :param benchmark_list: list of bad NFA properties B
     :param gen_name: the name of the generator function
     :param oneshot_name: the name of the oneshot function
     :param ignore_ambiguous: bool for ignoring ambitious states in the step game
+    :param minimize: if true T and IxB are replaced by their minimal deterministic transducers before the search.
+    Note, that the columns of oneshot depend on the states of T, so the result may differ from the original transducers
+    :param reduce: if true T and IxB are reduced before the search (see Automata.NFATransducer.reduce) and their sizes
+    before and after the reduction are printed
+    :param lazy_pairing: if true the pairings IxB are built on the fly during the search from the .json file instead of
+    being loaded from the compiled file (see Automata.LazyPairing)
+    :param output: if set, the record of each run is appended to this .jsonl file (see Results.py)
+    :param share_cache: if true all properties of a benchmark share one step game cache, the step games only depend on T
+    :param cache_capacity: the maximal number of entries of the step game cache, or None for an unbounded cache
+    :param cache_policy: the eviction policy of a bounded step game cache, one of OneshotSmart.StepGameCache.policies
+    :param store: if set, the step games are persisted in this sqlite file and replayed by later runs (see GameStore.py)
+    :param backward_pruning: if true states that cannot reach a final state are not explored (see Pruning.py)
+    :param storage: the name of a storage in storage_implementations for T, by default T keeps the storage it was
+    loaded with
+    :param instrument: if set, the phase timings, step game statistics and time series of each run are appended to this
+    .jsonl file (see Instrumentation.py)
+    :param profile: "cprofile" or "tracemalloc" to profile the search of each run. The profile is written next to the
+    instrument file as <instrument>.<benchmark>.<property>.prof
+    :param visited_mode: "exact" stores the visited states, "fingerprint" and "bitstate" only their hashes with a small
+    probability of missing states (see StateHashing.py)
+    :param bitstate_bytes: the size of the bitstate filter in bytes (default: OneshotSmart.bitstate_bytes)
+    :param error_bound: the omission probability above which fingerprint and bitstate runs stop
     :return:
     """
     gen_imp = gen_implementations.get(gen_name)
@@ -75,62 +123,92 @@ def execute_benchmarks(benchmark_list, gen_name, oneshot_name, ignore_ambiguous)
     if oneshot_imp is False:
         print(f'Oneshot "{oneshot_name}" implementation does not exists!')
         return
+    if profile is not None and instrument is None:
+        raise ValueError("Profiling requires the instrument file, next to which the profiles are written")
 
     print(f'Using generator: "{gen_name}" and oneshot implementation "{oneshot_name}":')
+    if minimize:
+        print("Warning: minimize keeps the languages of T and IxB, but oneshot explores the columns of the states of "
+              "the minimal T, so its verdicts may differ from the verdicts on the original transducers")
     for benchmark_name, testcases in benchmark_list:
         print("================================================")
         print(benchmark_name)
         print("================================================")
-        for test in testcases:
+        load_start = time.time()
+        rts = ModelCache.load_rts(benchmark_name, lazy_pairing=lazy_pairing)  # load the RTS once for all properties
+        load_time = time.time() - load_start
+        t = rts.get_T().minimize() if minimize else rts.get_T()
+        if reduce:
+            (t, report) = t.reduce()
+            print(f'T: {Automata.report_to_str(report)}')
+        if storage is not None:
+            t = t.copy_with_storage(storage_implementations[storage](t.get_alphabet_map()))
+        game_store = None
+        if store is not None:
+            game_store = GameStore.StepGameStore(store, t, GameStore.variant(gen_name, ignore_ambiguous, oneshot_name))
+        step_cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable(), cache_capacity, policy=cache_policy,
+                                                           store=game_store)
+        runs = [(test, [test]) for test in testcases]  # (name of the run, its properties)
+        if oneshot_name == "multi_disprove":
+            runs = [("+".join(testcases), testcases)]  # one search for all properties
+        for (test, properties) in runs:
             print(test)
-            rts = Automata.RTS(benchmark_name)
-            t = rts.get_T()
+            if not share_cache:
+                step_cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable(), cache_capacity,
+                                                                   policy=cache_policy, store=game_store)
 
-            ixb = rts.get_IxB(test)
+            if oneshot_name == "multi_disprove":
+                ixb = rts.get_multi_pairing(properties)  # built on the fly, so it is neither minimized nor reduced
+            else:
+                ixb = rts.get_IxB(test)
+                if minimize:
+                    ixb = ixb.minimize()
+                if reduce:
+                    (ixb, report) = ixb.reduce()
+                    print(f'IxB: {Automata.report_to_str(report)}')
 
             start_time = time.time()
 
-            o = Algorithms.OneshotSmart(ixb, t)
+            o = Algorithms.OneshotSmart(ixb, t, step_cache=step_cache)
             o.ignore_ambiguous = ignore_ambiguous
-            if oneshot_name == "multi_disprove":
-                try_one(o, o.multi_disprove_oneshot, max_time, gen_imp)
-            elif oneshot_name == "min_disprove":
-                try_one(o, o.min_sigma_disprove_oneshot, max_time, gen_imp)
-            elif oneshot_name == "dfs":
-                try_one(o, o.oneshot_dfs, max_time, gen_imp)
-            elif oneshot_name == "bfs":
-                try_one(o, o.oneshot_bfs, max_time, gen_imp)
+            o.backward_pruning = backward_pruning
+            o.visited_mode = visited_mode
+            o.bitstate_bytes = bitstate_bytes or o.bitstate_bytes
+            o.error_bound = error_bound
+            oneshot_func = getattr(o, oneshot_implementations[oneshot_name])
+            if instrument is not None:
+                o.instrumentation = Instrumentation.Instrumentation()
+                o.instrumentation.timings.update(rts.timings, load=load_time)
+            if profile is not None:
+                oneshot_func = Instrumentation.profiled(oneshot_func, profile,
+                                                        f'{instrument}.{benchmark_name}.{test}.prof')
+            with o.phase("search"):
+                (status, result) = try_one(o, oneshot_func, max_time, gen_imp)
 
             end_time = time.time()
 
             print(f'elapsed_time: {end_time - start_time}')
+            job = {"benchmark": benchmark_name, "property": test, "generator": gen_name, "oneshot": oneshot_name,
+                   "ignore_ambiguous": ignore_ambiguous, "visited_mode": visited_mode, "bitstate_bytes": bitstate_bytes,
+                   "error_bound": error_bound, "backward_pruning": backward_pruning, "storage": storage,
+                   "reduce": reduce, "lazy_pairing": lazy_pairing, "minimize": minimize,
+                   "cache": {"cache_capacity": cache_capacity, "cache_policy": cache_policy}}
+            if instrument is not None:
+                o.instrumentation.write(instrument, dict(job, status=status))
+            if output is not None:
+                for name in properties:  # multi_disprove returns the result of every property
+                    Results.write_record(output, Results.make_record(
+                        dict(job, property=name), o, result.get(name) if isinstance(result, dict) else result, status,
+                        {"load": load_time, "search": end_time - start_time}))
             print("------------------------------------------------")
+        if game_store is not None:
+            game_store.close()
 
 
-"""Run all benchmarks will all implementations"""
+"""Run all benchmarks will all implementations (use Runner.py to run them in parallel)"""
 if __name__ == '__main__':
-    execute_benchmarks(benchmarks, "buffer_bfs", "bfs", True)
-    print("================================================")
-    print("Ignore ambiguous == false")
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_bfs", "bfs", False)
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_bfs", "dfs", False)
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_dfs", "bfs", False)
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_dfs", "dfs", False)
-    print("================================================")
-    print("Ignore ambiguous == true")
-    print("================================================")
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_bfs", "dfs", True)
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_dfs", "bfs", True)
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_dfs", "dfs", True)
-    print("================================================")
-    print("Sigma disprove")
-    print("================================================")
-    execute_benchmarks(benchmarks, "buffer_bfs", "min_disprove", True)
-    execute_benchmarks(benchmarks, "buffer_dfs", "min_disprove", True)
+    for (gen_name, oneshot_name, ignore_ambiguous) in configurations:
+        print("================================================")
+        print(f'Ignore ambiguous == {str(ignore_ambiguous).lower()}')
+        print("================================================")
+        execute_benchmarks(benchmarks, gen_name, oneshot_name, ignore_ambiguous)
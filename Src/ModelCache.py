@@ -0,0 +1,160 @@
+"""Compiles regular transition systems into a binary format that can be loaded without parsing the .json file"""
+import Automata
+import Storage
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+FORMAT_VERSION = 3  # increase when the layout of compiled files or the construction of the transducers changes
+MAGIC = b"RTSC"
+CACHE_DIR = "benchmark/compiled"  # relative to the working directory, like the benchmark folder itself
+
+
+def content_hash(filename):
+    """
+    :param filename: a benchmark file in the folder benchmark
+    :return: the hash of the content of the file and the format version, used as name of the compiled file
+    """
+    with open(f'benchmark/{filename}', 'rb') as file:
+        digest = hashlib.sha256(file.read())
+    digest.update(struct.pack("<I", FORMAT_VERSION))
+    return digest.hexdigest()
+
+
+def compiled_path(filename):
+    """
+    :param filename: a benchmark file in the folder benchmark
+    :return: the path of the compiled file for the current content of filename
+    """
+    return f'{CACHE_DIR}/{content_hash(filename)}.rts'
+
+
+def load_rts(filename, use_cache=True, lazy_pairing=False):
+    """
+    Loads an RTS from its compiled file. If there is no compiled file for the current content of the benchmark file,
+    the RTS is built from the .json file and compiled for the next load.
+    :param filename: a benchmark file in the folder benchmark
+    :param use_cache: if false the RTS is always built from the .json file
+    :param lazy_pairing: if true the RTS is built from the .json file with lazy pairings IxB (see Automata.LazyPairing).
+    The compiled file contains the eager pairings, so it is not used
+    :return: the RTS
+    """
+    if not use_cache or lazy_pairing:
+        return Automata.RTS(filename, lazy_pairing)
+    path = compiled_path(filename)
+    if os.path.exists(path):
+        rts = read_compiled(path)
+        if rts is not None:
+            return rts
+    rts = Automata.RTS(filename)
+    write_compiled(rts, path)
+    return rts
+
+
+def write_compiled(rts, path):
+    """
+    Writes the transducers T, I, all B and all IxB of rts to path. The file consists of
+    MAGIC, the length of the header, a .json header and one int32 array per transition table.
+    :param rts: the RTS to be compiled
+    :param path: the path of the compiled file
+    """
+    transducers = {"T": rts.get_T(), "I": rts.get_I()}
+    transducers.update({f'B/{name}': rts.get_B(name) for name in rts.B_dict})
+    transducers.update({f'IxB/{name}': rts.get_IxB(name) for name in rts.IxB_dict})
+
+    data = array('i')
+    header = {"version": FORMAT_VERSION, "byteorder": sys.byteorder, "alphabet": rts.alphabet_map.sigma,
+              "properties": list(rts.B_dict), "transducers": {}}
+    for (key, transducer) in transducers.items():
+        states, offsets, symbols, targets, sorted_symbols, order = [], [], [], [], [], []
+        for q in transducer.state_iterator():
+            states.append(q)
+            offset = len(symbols)
+            offsets.append(offset)
+            for (x_y_int, p) in transducer.get_transitions(q):  # in their order, which decides the exploration order
+                symbols.append(x_y_int)
+                targets.append(p)
+            # the sorted index lets CompiledStorageNFA.get_successors find the targets of a symbol with bisect
+            by_symbol = sorted(range(offset, len(symbols)), key=symbols.__getitem__)
+            sorted_symbols.extend(symbols[j] for j in by_symbol)
+            order.extend(by_symbol)
+        offsets.append(len(symbols))
+
+        arrays = {}
+        for (name, values) in (("states", states), ("offsets", offsets), ("symbols", symbols), ("targets", targets),
+                               ("sorted_symbols", sorted_symbols), ("order", order)):
+            arrays[name] = [len(data), len(values)]  # the position and length of the array in data
+            data.extend(values)
+        encoder = transducer.state_encoder
+        header["transducers"][key] = {
+            "state_count": transducer.state_count,
+            "initial_states": transducer.get_initial_states(),
+            "final_states": transducer.get_final_states(),
+            "radices": list(encoder.radices) if isinstance(encoder, Storage.StateEncoder) else None,
+            "arrays": arrays}
+
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % data.itemsize)  # align the arrays
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(header_bytes)))
+        file.write(header_bytes)
+        data.tofile(file)
+    os.replace(tmp_path, path)  # other processes never see a partially written file
+
+
+def read_compiled(path):
+    """
+    Maps a compiled file into memory. The transition tables are used in place as memoryviews of the mapped file.
+    :param path: the path of the compiled file
+    :return: the RTS stored in the file, or None if the file is not compatible with this version
+    """
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(MAGIC)] != MAGIC:
+        return None
+    (header_length,) = struct.unpack_from("<I", mapped, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(mapped[start:start + header_length]))
+    if header["version"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+        return None
+    data = memoryview(mapped)[start + header_length:].cast('i')
+
+    rts = Automata.RTS()
+    rts.alphabet_map = Storage.AlphabetMap(header["alphabet"])
+    transducers = {}
+    for (key, spec) in header["transducers"].items():
+        views = {name: data[position:position + length] for (name, (position, length)) in spec["arrays"].items()}
+        transducer = Automata.NFATransducer(rts.alphabet_map, Storage.CompiledStorageNFA(
+            views["states"], views["offsets"], views["symbols"], views["targets"], views["sorted_symbols"],
+            views["order"]))
+        transducer.set_state_count(spec["state_count"])
+        transducer.add_initial_state_list(spec["initial_states"])
+        transducer.add_final_state_list(spec["final_states"])
+        if spec["radices"] is not None:
+            transducer.state_encoder = Storage.StateEncoder(spec["radices"])
+        transducers[key] = transducer
+
+    rts.T = transducers["T"]
+    rts.I = transducers["I"]
+    rts.B_dict = {name: transducers[f'B/{name}'] for name in header["properties"]}
+    rts.IxB_dict = {name: transducers[f'IxB/{name}'] for name in header["properties"]}
+    rts.timings = {"pairing": 0.0}  # the pairings are stored in the file, so they are not built again
+    return rts
+
+
+"""Compile all benchmarks"""
+if __name__ == '__main__':
+    for benchmark in sorted(os.listdir("benchmark")):
+        if benchmark.endswith(".json"):
+            try:
+                load_rts(benchmark)
+                print(f'{benchmark} -> {compiled_path(benchmark)}')
+            except Exception as e:
+                print(f'{benchmark} could not be compiled: {e}')
@@ -0,0 +1,111 @@
+"""Backward pruning for oneshot: removes states of the intersection transducer that cannot reach a final state"""
+from functools import reduce
+
+
+class BackwardPruning:
+    """
+    Over-approximates backward from the final states which states (ib, c) of the intersection of IxB and the
+    inductive transducer can reach a final state. The columns c are abstracted to the sets of their T states:
+    A step game of c for an IxB transition with the symbols (u, v) only uses T transitions (x, y) of states in c whose y
+    is u or the x of another used transition, every state of c takes at least one of them, and the game is only won if
+    v is u or the x of a used transition. The successor column consists of the targets of the used transitions.
+    The abstraction has 2^|T| sets per IxB state, so it is only computed for small T (max_t_states).
+    """
+
+    max_t_states = 10
+
+    def __init__(self, IxB, T):
+        """
+        :param IxB: A pairing transducer from the NFA I and NFA B
+        :param T: The transition transducer T
+        """
+        alphabet_map = T.get_alphabet_map()
+        t_states = sorted(set(T.state_iterator()) | {p for q in T.state_iterator() for (_, p) in T.get_transitions(q)})
+        self.bits = {q: 1 << i for (i, q) in enumerate(t_states)}  # maps a T state to its bit in the set of a column
+        self.enabled = len(t_states) <= self.max_t_states
+        self.transitions = [[(alphabet_map.get_x(x_y_int), alphabet_map.get_y(x_y_int), self.bits[p])
+                             for (x_y_int, p) in T.get_transitions(q)] for q in t_states]
+        self.relations = {}  # maps (set, u, v) to the step of the set (see relation)
+        self.steps = {}  # maps (set, u, v, ib_succ) to the answer of has_alive_successor after the fixed point
+        self.alive = {}  # maps a state of IxB to the sets of T states from which a final state may be reachable
+        if not self.enabled:
+            return
+
+        final = reduce(lambda mask, q: mask | self.bits.get(q, 0), T.get_final_states(), 0)
+        ixb_states = set(IxB.state_iterator()) | set(IxB.get_final_states()) | set(IxB.get_initial_states())
+        self.alive = {ib: set() for ib in ixb_states}
+        for ib in IxB.get_final_states():
+            self.alive[ib] = {s for s in range(1, 1 << len(t_states)) if s & ~final == 0}
+        edges = {ib: [(alphabet_map.get_y(u_v_int), alphabet_map.get_x(u_v_int), ib_succ)
+                      for (u_v_int, ib_succ) in IxB.get_transitions(ib)] for ib in ixb_states}
+
+        # least fixed point: a set is alive, if it has an alive successor set for some IxB transition
+        changed = True
+        while changed:
+            changed = False
+            for ib in ixb_states:
+                for s in range(1, 1 << len(t_states)):
+                    if s not in self.alive[ib] and any(self.has_alive_successor(s, u, v, ib_succ)
+                                                       for (u, v, ib_succ) in edges[ib]):
+                        self.alive[ib].add(s)
+                        changed = True
+
+    def relation(self, s, u, v):
+        """
+        :param s: a set of T states as a bit map
+        :param u: the y symbol of an IxB transition
+        :param v: the x symbol of an IxB transition
+        :return: None if no step game of s can be won, otherwise (the sets of possible successors of each state in s,
+        the set of all possible successors)
+        """
+        key = (s, u, v)
+        if key not in self.relations:
+            used = [(i, x, y, p) for (i, transitions) in enumerate(self.transitions) if (s >> i) & 1
+                    for (x, y, p) in transitions]
+            while True:  # remove the transitions whose y cannot be removed from the seperator
+                removed = {u} | {x for (_, x, _, _) in used}
+                usable = [transition for transition in used if transition[2] in removed]
+                if len(usable) == len(used):
+                    break
+                used = usable
+            successors = {}
+            for (i, _, _, p) in used:
+                successors[i] = successors.get(i, 0) | p
+            if v in removed and len(successors) == bin(s).count("1"):
+                self.relations[key] = (list(successors.values()), reduce(int.__or__, successors.values(), 0))
+            else:
+                self.relations[key] = None
+        return self.relations[key]
+
+    def has_alive_successor(self, s, u, v, ib_succ):
+        """
+        :return: true if a step game of the set s for an IxB transition (u, v) may be won by an alive set of ib_succ
+        """
+        step = self.relation(s, u, v)
+        return step is not None and any(s_succ & ~step[1] == 0 and all(successors & s_succ for successors in step[0])
+                                        for s_succ in self.alive.get(ib_succ, ()))
+
+    def column_set(self, column):
+        """
+        :param column: a column as a tuple of T states
+        :return: the set of its states as a bit map
+        """
+        return reduce(lambda mask, q: mask | self.bits[q], column, 0)
+
+    def is_alive(self, ib, column):
+        """
+        :return: false if no final state is reachable from the state (ib, column) of the intersection transducer
+        """
+        return not self.enabled or self.column_set(column) in self.alive.get(ib, ())
+
+    def can_step(self, column, u, v, ib_succ):
+        """
+        :return: false if the step game of column for the IxB transition (u, v) cannot have a successor column d, such
+        that (ib_succ, d) is alive. The game does not need to be played then
+        """
+        if not self.enabled:
+            return True
+        key = (self.column_set(column), u, v, ib_succ)
+        if key not in self.steps:
+            self.steps[key] = self.has_alive_successor(*key)
+        return self.steps[key]
@@ -0,0 +1,138 @@
+"""Machine-readable records of benchmark runs (one .json object per line) and the comparison of two runs"""
+import argparse
+import json
+import sys
+
+try:
+    import resource  # not available on every platform, the peak memory is not recorded without it
+except ImportError:
+    resource = None
+
+KEY_FIELDS = ("benchmark", "property", "generator", "oneshot", "ignore_ambiguous")  # required fields of every job
+# the optional fields of a job that change its search and their defaults, together with KEY_FIELDS they identify a run
+MODE_FIELDS = {"visited_mode": "exact", "bitstate_bytes": None, "error_bound": None, "max_columns": None,
+               "max_frontier": None, "backward_pruning": False, "storage": None, "reduce": False, "lazy_pairing": False,
+               "minimize": False, "cache": {"cache_policy": "lru"}}
+
+
+def peak_rss():
+    """
+    :return: the peak resident set size of the current process in bytes, or None if it is not available
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024  # macOS reports bytes, Linux kilobytes
+
+
+def make_record(job, o=None, result=None, status="done", timings=None):
+    """
+    :param job: the configuration of the run (benchmark, property, generator, oneshot, ignore_ambiguous)
+    :param o: the OneshotSmart object after the run, or None if the run did not finish
+    :param result: the return value of the oneshot implementation
+    :param status: done, timeout, memout, error or crashed
+    :param timings: a dictionary of the duration of each phase in seconds, e.g. {"load": 0.1, "search": 2.0}
+    :return: the record of the run. Its peak_rss is only set by Runner.job_worker, whose process executes a single job
+    """
+    record = {field: job[field] for field in KEY_FIELDS}
+    record.update({field: job.get(field, default) for (field, default) in MODE_FIELDS.items()})
+    cache = dict(MODE_FIELDS["cache"], **(job.get("cache") or {}))  # options that are None have their defaults
+    record["cache"] = {option: cache[option] for option in sorted(cache) if cache[option] is not None}
+    record["status"] = status
+    record["verdict"] = None
+    if status == "done":
+        record["verdict"] = ("✓", "x")[result is not None]
+    if o is not None:
+        record.update(o.statistics())
+        if status == "done" and result is None and not record["exact"]:
+            record["verdict"] = "?"  # without a counterexample, a search that is not exact is no proof
+    record["peak_rss"] = None
+    record["timings"] = timings or {}
+    return record
+
+
+def write_record(path, record):
+    """
+    Appends record as one line to the file path
+    """
+    with open(path, 'a') as file:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def record_key(record):
+    """
+    :return: the configuration of the run of a record, its KEY_FIELDS and MODE_FIELDS. Records written before a mode
+    field was added have its default
+    """
+    modes = (record.get(field, default) for (field, default) in MODE_FIELDS.items())
+    return tuple(record[field] for field in KEY_FIELDS) + tuple(json.dumps(mode, sort_keys=True) for mode in modes)
+
+
+def key_to_str(key):
+    """
+    :return: the KEY_FIELDS of a record_key and the modes that differ from their defaults
+    """
+    modes = [f'{field}={mode}' for ((field, default), mode) in zip(MODE_FIELDS.items(), key[len(KEY_FIELDS):])
+             if mode != json.dumps(default)]
+    return "/".join(map(str, key[:len(KEY_FIELDS)])) + "".join(f' {mode}' for mode in modes)
+
+
+def read_records(path):
+    """
+    :param path: a file of records
+    :return: a dictionary that maps the record_key of each record to the record
+    """
+    records = {}
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                records[record_key(record)] = record
+    return records
+
+
+def record_time(record):
+    """
+    :return: the total duration of all phases of a record
+    """
+    return sum(record["timings"].values())
+
+
+def compare(old_path, new_path, threshold, min_delta=0.01):
+    """
+    Compares the runs in old_path with the runs with the same configuration (record_key) in new_path
+    :param threshold: the relative slowdown, e.g. 0.1 for 10%, above which a run is flagged
+    :param min_delta: the absolute slowdown in seconds below which a run is never flagged (timer noise)
+    :return: a list of (key, reason) of all flagged runs
+    """
+    old_records, new_records = read_records(old_path), read_records(new_path)
+    flagged = []
+    for (key, new) in new_records.items():
+        old = old_records.get(key)
+        if old is None:
+            continue
+        if old["status"] != new["status"]:
+            flagged.append((key, f'status {old["status"]} -> {new["status"]}'))
+        elif old["verdict"] != new["verdict"]:
+            flagged.append((key, f'verdict {old["verdict"]} -> {new["verdict"]}'))
+        elif new["status"] == "done" and record_time(new) > record_time(old) * (1 + threshold) and \
+                record_time(new) - record_time(old) > min_delta:
+            flagged.append((key, f'time {record_time(old):.3f}s -> {record_time(new):.3f}s '
+                                 f'(+{100 * (record_time(new) / max(record_time(old), 1e-9) - 1):.0f}%)'))
+    return flagged
+
+
+"""Compare two result files"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Flags runs of NEW that are slower than the same runs of OLD")
+    parser.add_argument("old", help="the reference result file")
+    parser.add_argument("new", help="the result file to be checked")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown that is flagged (0.1 = 10%%)")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="absolute slowdown in seconds that is ignored")
+    args = parser.parse_args()
+
+    regressions = compare(args.old, args.new, args.threshold, args.min_delta)
+    for (run, reason) in regressions:
+        print(f'{key_to_str(run)}: {reason}')
+    print(f'{len(regressions)} regression(s)')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,354 @@
+"""Runs benchmark jobs in parallel. Every job is executed in its own process with a wall-clock and a memory limit"""
+import Algorithms
+import GameStore
+import Instrumentation
+import Main
+import ModelCache
+import Results
+import StateHashing
+import Util
+import argparse
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import time
+
+try:
+    import resource  # not available on every platform, memory limits are ignored without it
+except ImportError:
+    resource = None
+
+
+def benchmark_jobs(benchmark_list, configuration_list):
+    """
+    :param benchmark_list: list of benchmark files and their properties, e.g. Main.benchmarks
+    :param configuration_list: list of (generator, oneshot implementation, ignore ambiguous), e.g. Main.configurations
+    :return: a list of jobs, one for each property and configuration. A job is a dictionary of its configuration.
+    multi_disprove checks all properties of a benchmark in one job, whose entry "properties" lists them and whose
+    property is their names joined by "+" (see property_jobs)
+    """
+    jobs = []
+    for (gen_name, oneshot_name, ignore_ambiguous) in configuration_list:
+        for (benchmark_name, testcases) in benchmark_list:
+            job = {"benchmark": benchmark_name, "generator": gen_name, "oneshot": oneshot_name,
+                   "ignore_ambiguous": ignore_ambiguous}
+            if oneshot_name == "multi_disprove":
+                jobs.append(dict(job, property="+".join(testcases), properties=list(testcases)))
+            else:
+                jobs += [dict(job, property=test) for test in testcases]
+    return jobs
+
+
+def property_jobs(job):
+    """
+    :return: the jobs whose records a job has, one for each property of a multi_disprove job and the job itself
+    otherwise
+    """
+    if "properties" not in job:
+        return [job]
+    return [dict(job, property=name) for name in job["properties"]]
+
+
+class JobModels:
+    """
+    Loads the transducers and creates the step game caches of jobs. A JobModels object that is used for several jobs
+    keeps them in memory: jobs of the same benchmark share the RTS and jobs that also have the same generator,
+    ignore_ambiguous and oneshot implementation share the step game cache (see Daemon.py). Runner uses a new object for
+    every job
+    """
+
+    def __init__(self):
+        self.transducers = {}  # maps (benchmark, lazy_pairing, reduce, storage) to (rts, T, report of the reduction)
+        self.pairings = {}  # maps the key of the transducers and a property to (IxB, report of the reduction)
+        self.step_caches = {}  # maps the key of the transducers and the configuration of the cache to a cache
+
+    @staticmethod
+    def transducer_key(job):
+        return job["benchmark"], job.get("lazy_pairing", False), job.get("reduce", False), job.get("storage")
+
+    @staticmethod
+    def step_cache_key(job):
+        cache = job.get("cache", {})
+        return JobModels.transducer_key(job) + (job["generator"], job["ignore_ambiguous"], job["oneshot"],
+                                                tuple(sorted(cache.items())))
+
+    def get_transducers(self, job):
+        """
+        :param job: the configuration of a job
+        :return: the transducers T and IxB of the job and the reports of their reduction, or None if the job does not
+        reduce them (see Automata.NFATransducer.reduce)
+        """
+        key = self.transducer_key(job)
+        if key not in self.transducers:
+            rts = ModelCache.load_rts(job["benchmark"], lazy_pairing=job.get("lazy_pairing", False))
+            (T, t_report) = rts.get_T().reduce() if job.get("reduce") else (rts.get_T(), None)
+            if job.get("storage") is not None:
+                T = T.copy_with_storage(Main.storage_implementations[job["storage"]](T.get_alphabet_map()))
+            self.transducers[key] = (rts, T, t_report)
+        (rts, T, t_report) = self.transducers[key]
+        if key + (job["property"],) not in self.pairings:
+            if "properties" in job:  # built on the fly, so it is not reduced (like in Main.execute_benchmarks)
+                self.pairings[key + (job["property"],)] = (rts.get_multi_pairing(job["properties"]), None)
+            else:
+                IxB = rts.get_IxB(job["property"])
+                self.pairings[key + (job["property"],)] = IxB.reduce() if job.get("reduce") else (IxB, None)
+        (IxB, ixb_report) = self.pairings[key + (job["property"],)]
+        return T, IxB, None if t_report is None else {"T": t_report, "IxB": ixb_report}
+
+    def get_step_cache(self, job, T):
+        """
+        :param job: the configuration of a job without a store, the optional entry "cache" holds the keyword arguments
+        of the cache
+        :param T: the transducer T of the job
+        :return: the step game cache of the job
+        """
+        key = self.step_cache_key(job)
+        if key not in self.step_caches:
+            cache = job.get("cache", {})
+            self.step_caches[key] = Algorithms.OneshotSmart.StepGameCache(
+                Util.ColumnTable(), cache.get("cache_capacity"), cache.get("cache_max_bytes"),
+                cache.get("cache_policy", "lru"))
+        return self.step_caches[key]
+
+    def discard_step_cache(self, job):
+        """
+        Removes the step game cache of a job that did not finish, its games may be partially played
+        """
+        self.step_caches.pop(self.step_cache_key(job), None)
+
+    def rts_timings(self, job):
+        return self.transducers[self.transducer_key(job)][0].timings
+
+
+def execute_job(job, models=None):
+    """
+    Executes oneshot for a single job in the current process
+    :param job: the configuration of the job, the optional entry "cache" holds the keyword arguments of the step game
+    cache (cache_capacity, cache_max_bytes, cache_policy) and the optional entry "store" the path of a sqlite file that
+    persists the step games (see GameStore.py). If the optional entry "backward_pruning" is true, states that cannot
+    reach a final state are not explored (see Pruning.py). The optional entry "storage" names the storage of T in
+    Main.storage_implementations. The optional entries "instrument" and "profile" enable the instrumentation and the
+    profiler of the run (see Main.execute_benchmarks). The optional entries "visited_mode", "bitstate_bytes",
+    "error_bound", "max_columns" and "max_frontier" select how the visited states are stored and bound the memory of the
+    search (see StateHashing.py and Algorithms.OneshotSmart.column_id). If the optional entry "reduce" is
+    true, T and IxB are reduced before the search and the record contains the sizes before and after the reduction (see
+    Automata.NFATransducer.reduce). If the optional entry "lazy_pairing" is true, IxB is built on the fly (see
+    Automata.LazyPairing)
+    :param models: the JobModels object that loads the transducers and the step game cache, a new one by default
+    :return: the record of the oneshot execution (see Results.make_record)
+    """
+    if "properties" in job:
+        raise ValueError("A multi_disprove job has a record for each of its properties, see execute_job_records")
+    [record] = execute_job_records(job, models)
+    return record
+
+
+def execute_job_records(job, models=None):
+    """
+    Executes oneshot for a single job in the current process, like execute_job, but also executes multi_disprove jobs
+    (see benchmark_jobs)
+    :param job: the configuration of the job
+    :param models: the JobModels object that loads the transducers and the step game cache, a new one by default
+    :return: the records of the jobs of property_jobs(job)
+    """
+    start_time = time.time()
+    models = models or JobModels()
+    (T, IxB, reduction) = models.get_transducers(job)
+    load_time = time.time()
+    game_store = None
+    if job.get("store") is not None:
+        variant = GameStore.variant(job["generator"], job["ignore_ambiguous"], job["oneshot"])
+        game_store = GameStore.StepGameStore(job["store"], T, variant)
+        cache = job.get("cache", {})
+        step_cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable(), cache.get("cache_capacity"),
+                                                           cache.get("cache_max_bytes"),
+                                                           cache.get("cache_policy", "lru"), game_store)
+    else:
+        step_cache = models.get_step_cache(job, T)
+    o = Algorithms.OneshotSmart(IxB, T, step_cache=step_cache)
+    o.ignore_ambiguous = job["ignore_ambiguous"]
+    o.backward_pruning = job.get("backward_pruning", False)
+    o.visited_mode = job.get("visited_mode", "exact")
+    o.bitstate_bytes = job.get("bitstate_bytes") or o.bitstate_bytes
+    o.error_bound = job.get("error_bound")
+    o.max_columns = job.get("max_columns") or o.max_columns
+    o.max_frontier = job.get("max_frontier") or o.max_frontier
+    oneshot_func = getattr(o, Main.oneshot_implementations[job["oneshot"]])
+    if job.get("instrument") is not None:
+        o.instrumentation = Instrumentation.Instrumentation()
+        o.instrumentation.timings.update(models.rts_timings(job), load=load_time - start_time)
+        if job.get("profile") is not None:
+            profile_path = f'{job["instrument"]}.{".".join(str(job[field]) for field in Results.KEY_FIELDS)}.prof'
+            oneshot_func = Instrumentation.profiled(oneshot_func, job["profile"], profile_path)
+    try:
+        with o.phase("search"):
+            result = oneshot_func(Main.gen_implementations[job["generator"]])
+    finally:
+        if game_store is not None:
+            game_store.close()  # keeps the games of a job that is interrupted, e.g. by a MemoryError
+    if o.instrumentation is not None:
+        o.instrumentation.write(job["instrument"], {field: job[field] for field in Results.KEY_FIELDS})
+    timings = {"load": load_time - start_time, "search": time.time() - load_time}
+    records = []
+    for property_job in property_jobs(job):
+        # multi_disprove returns the result of every property
+        property_result = result.get(property_job["property"]) if "properties" in job else result
+        records.append(Results.make_record(property_job, o, property_result, timings=timings))
+        if reduction is not None:
+            records[-1]["reduction"] = reduction
+    return records
+
+
+def job_worker(job, connection, memory_limit):
+    """
+    The entry point of a job process. Sends the records of the job through connection
+    :param job: the configuration of the job
+    :param connection: the sending end of a pipe to the runner
+    :param memory_limit: the maximal address space of the process in bytes, or None
+    """
+    if memory_limit is not None and resource is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            pass  # e.g. macOS does not support limiting the address space
+    try:
+        records = execute_job_records(job)
+        for record in records:
+            record["peak_rss"] = Results.peak_rss()  # the process only executes this job
+    except MemoryError:
+        records = [Results.make_record(property_job, status="memout") for property_job in property_jobs(job)]
+    except Exception as e:
+        records = [Results.make_record(property_job, status="error") for property_job in property_jobs(job)]
+        for record in records:
+            record["error"] = repr(e)
+    connection.send(records)
+    connection.close()
+
+
+def run_jobs(jobs, workers=None, timeout=Main.max_time, memory_limit=None):
+    """
+    Runs the jobs in a pool of at most workers processes. A job that exceeds timeout is killed and reported as
+    timed out, the remaining jobs are not affected.
+    :param jobs: a list of jobs
+    :param workers: the number of parallel processes, by default the number of cpus
+    :param timeout: the wall-clock limit of a job in seconds
+    :param memory_limit: the memory limit of a job in bytes, or None
+    :return: lazily returns the records of the jobs (see Results.make_record) in the order in which they finish, a
+    multi_disprove job has a record for each of its properties
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = list(reversed(jobs))
+    running = {}  # maps the receiving end of a job's pipe to (job, process, deadline)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            job = pending.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=job_worker, args=(job, sender, memory_limit), daemon=True)
+            process.start()
+            sender.close()  # the job process holds the only sending end, so its exit is seen as EOF
+            running[receiver] = (job, process, time.time() + timeout)
+
+        next_deadline = min(deadline for (_, _, deadline) in running.values())
+        for receiver in wait(list(running), timeout=max(0.0, next_deadline - time.time())):
+            (job, process, _) = running.pop(receiver)
+            try:
+                records = receiver.recv()
+            except EOFError:  # the process died without a record, e.g. it was killed by the OS
+                process.join()
+                records = [Results.make_record(property_job, status="crashed") for property_job in property_jobs(job)]
+                for record in records:
+                    record["exitcode"] = process.exitcode
+            receiver.close()
+            process.join()
+            yield from records
+
+        now = time.time()
+        for receiver in [receiver for (receiver, (_, _, deadline)) in running.items() if deadline <= now]:
+            (job, process, _) = running.pop(receiver)
+            process.kill()
+            process.join()
+            receiver.close()
+            for property_job in property_jobs(job):
+                yield Results.make_record(property_job, status="timeout", timings={"search": timeout})
+
+
+def record_to_str(record):
+    """
+    :param record: the record of a job
+    :return: a one line summary of the record
+    """
+    config = f'{record["benchmark"]}/{record["property"]} {record["generator"]} {record["oneshot"]} ' \
+             f'ignore_ambiguous={record["ignore_ambiguous"]}'
+    if record["status"] != "done":
+        return f'{config}: {record["status"]} {record.get("error", "")}'
+    summary = f'{config}: {record["verdict"]} # states: {record["states"]} # transitions: {record["transitions"]} ' \
+              f'# cache hits: {record["cache_hits"]} elapsed_time: {Results.record_time(record):.3f}'
+    if not record.get("exact", True):
+        summary += f' (probabilistic, omission probability {record["omission_probability"]:.2e})'
+    return summary
+
+
+"""Run all benchmarks with all implementations in parallel"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Runs all benchmarks with all configurations in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="number of parallel jobs (default: #cpus)")
+    parser.add_argument("--timeout", type=int, default=Main.max_time, help="wall-clock limit per job in seconds")
+    parser.add_argument("--memory", type=int, default=None, help="memory limit per job in MB")
+    parser.add_argument("--output", default=None, help="append the record of each job to this .jsonl file")
+    parser.add_argument("--cache-entries", type=int, default=None, help="maximal number of step game cache entries")
+    parser.add_argument("--cache-mb", type=int, default=None, help="approximate maximal size of the step game cache")
+    parser.add_argument("--cache-policy", default="lru", choices=Algorithms.OneshotSmart.StepGameCache.policies,
+                        help="eviction policy of a bounded step game cache")
+    parser.add_argument("--store", default=None, help="persist the step games in this sqlite file across runs")
+    parser.add_argument("--backward", action="store_true", help="prune states that cannot reach a final state")
+    parser.add_argument("--lazy-pairing", action="store_true",
+                        help="build the pairings IxB on the fly during the search instead of loading them")
+    parser.add_argument("--reduce", action="store_true",
+                        help="trim T and IxB and merge their bisimilar states before the search")
+    parser.add_argument("--visited", default="exact", choices=StateHashing.visited_modes,
+                        help="store the visited states, their 64 bit fingerprints or a bitstate filter of them")
+    parser.add_argument("--bitstate-mb", type=int, default=None, help="size of the bitstate filter in MB")
+    parser.add_argument("--error-bound", type=float, default=None,
+                        help="stop fingerprint and bitstate runs before their estimated omission probability exceeds "
+                             "this bound, bitstate runs choose their number of hashes for it")
+    parser.add_argument("--max-columns", type=int, default=None,
+                        help="clear the column table and step game cache of fingerprint and bitstate runs above this "
+                             "number of columns")
+    parser.add_argument("--max-frontier", type=int, default=None,
+                        help="maximal number of states waiting to be explored in fingerprint and bitstate runs")
+    parser.add_argument("--instrument", default=None, help="append the instrumentation of each job to this file")
+    parser.add_argument("--profile", default=None, choices=Instrumentation.profilers,
+                        help="profile each job, the profiles are written next to the instrumentation file")
+    parser.add_argument("--storage", default=None, choices=Main.storage_implementations,
+                        help="storage of T (default: the storage of the loaded benchmark)")
+    args = parser.parse_args()
+    if args.profile is not None and args.instrument is None:
+        parser.error("--profile requires --instrument")
+
+    for benchmark_name, _ in Main.benchmarks:
+        ModelCache.load_rts(benchmark_name)  # compile once before the jobs load the benchmarks concurrently
+
+    all_jobs = benchmark_jobs(Main.benchmarks, Main.configurations)
+    for job in all_jobs:
+        job["cache"] = {"cache_capacity": args.cache_entries, "cache_policy": args.cache_policy,
+                        "cache_max_bytes": None if args.cache_mb is None else args.cache_mb * 1024 * 1024}
+        job["store"] = args.store
+        job["backward_pruning"] = args.backward
+        job["reduce"] = args.reduce
+        job["lazy_pairing"] = args.lazy_pairing
+        job["visited_mode"] = args.visited
+        job["bitstate_bytes"] = None if args.bitstate_mb is None else args.bitstate_mb * 1024 * 1024
+        job["error_bound"] = args.error_bound
+        job["max_columns"] = args.max_columns
+        job["max_frontier"] = args.max_frontier
+        job["storage"] = args.storage
+        job["instrument"] = args.instrument
+        job["profile"] = args.profile
+    memory = None if args.memory is None else args.memory * 1024 * 1024
+    start = time.time()
+    for job_record in run_jobs(all_jobs, args.workers, args.timeout, memory):
+        print(record_to_str(job_record), flush=True)
+        if args.output is not None:
+            Results.write_record(args.output, job_record)
+    print(f'{len(all_jobs)} jobs finished after {time.time() - start:.1f} seconds')
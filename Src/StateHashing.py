@@ -0,0 +1,150 @@
+"""
+Compact sets of visited states for memory bounded oneshot runs, they store hashes instead of the states. Both sets
+record when the estimated probability that a state was wrongly considered visited exceeds an error bound, the search
+then stops (see Algorithms.OneshotSmart.frontier_full)
+"""
+from array import array
+import math
+
+visited_modes = ("exact", "fingerprint", "bitstate")
+FINGERPRINT_MASK = (1 << 64) - 1
+
+
+def fingerprint(state):
+    """
+    :param state: a hashable state, e.g. (ib, column id)
+    :return: a 64 bit fingerprint of the state that is not 0. The hash of ints and tuples of ints does not depend on the
+    hash seed of the process
+    """
+    return (hash(state) & FINGERPRINT_MASK) or 1
+
+
+class FingerprintSet:
+    """
+    Stores the 64 bit fingerprints of the states in an open addressing table with linear probing (8 bytes per slot,
+    at most half of the slots are used). Two states with the same fingerprint are considered equal, so a state is
+    wrongly considered visited with probability of at most n^2 / 2^65 for n stored states (hash compaction)
+    """
+
+    exact = False
+
+    def __init__(self, capacity=1 << 10, error_bound=None):
+        """
+        :param capacity: the initial number of slots, a power of two
+        :param error_bound: if set, the number of states after which the omission probability exceeds it is recorded
+        """
+        self.slots = array("Q", bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.size = 0
+        self.error_bound = error_bound
+        self.bound_exceeded_at = None  # the number of stored states when the error bound was exceeded
+
+    def find(self, value):
+        """
+        :param value: a fingerprint
+        :return: the slot of the fingerprint, or the empty slot where it would be inserted
+        """
+        slot = value & self.mask
+        while self.slots[slot] != 0 and self.slots[slot] != value:
+            slot = (slot + 1) & self.mask
+        return slot
+
+    def add(self, state):
+        value = fingerprint(state)
+        slot = self.find(value)
+        if self.slots[slot] == 0:
+            self.slots[slot] = value
+            self.size += 1
+            if 2 * self.size > len(self.slots):
+                self.grow()
+            if self.bound_exceeded_at is None and self.error_bound is not None and \
+                    self.omission_probability() > self.error_bound:
+                self.bound_exceeded_at = self.size
+
+    def grow(self):
+        """Doubles the number of slots"""
+        values = [value for value in self.slots if value != 0]
+        self.slots = array("Q", bytes(16 * len(self.slots)))
+        self.mask = len(self.slots) - 1
+        for value in values:
+            self.slots[self.find(value)] = value
+
+    def omission_probability(self):
+        """
+        :return: an upper bound of the probability that a state was wrongly considered visited
+        """
+        return min(1.0, self.size * self.size / 2 ** 65)
+
+    def nbytes(self):
+        return self.slots.itemsize * len(self.slots)
+
+    def __contains__(self, state):
+        return self.slots[self.find(fingerprint(state))] != 0
+
+    def __len__(self):
+        return self.size
+
+
+class BitstateSet:
+    """
+    Bitstate hashing: a Bloom filter of a fixed number of bytes that sets hashes bits per state. The memory does not
+    grow with the number of states, instead the probability that a new state is wrongly considered visited (and is not
+    explored) grows. It is estimated by (1 - e^(-hashes * n / bits))^hashes for n stored states.
+    For an error bound e the number of hashes is chosen as ceil(log2(1 / e)): the filter then holds the most states,
+    about bits * ln(2) / hashes, before the estimate exceeds e (at this load half of the bits are set)
+    """
+
+    exact = False
+
+    def __init__(self, max_bytes, hashes=None, error_bound=None):
+        """
+        :param max_bytes: the size of the filter in bytes
+        :param hashes: the number of bits per state, by default 3 or chosen for the error bound
+        :param error_bound: if set, the hashes are chosen for it and the number of states after which the estimated
+        probability exceeds it is recorded, the search stops there
+        """
+        self.bits = bytearray(max_bytes)
+        self.nbits = 8 * max_bytes
+        if hashes is None:
+            hashes = 3 if error_bound is None else min(32, max(1, math.ceil(math.log2(1 / error_bound))))
+        self.hashes = hashes
+        self.error_bound = error_bound
+        self.bound_exceeded_at = None  # the number of stored states when the error bound was exceeded
+        self.size = 0
+
+    def positions(self, state):
+        """
+        :return: the bits of the state (double hashing of the two halves of its fingerprint)
+        """
+        value = fingerprint(state)
+        (h1, h2) = (value & 0xffffffff, (value >> 32) | 1)
+        return [(h1 + i * h2) % self.nbits for i in range(self.hashes)]
+
+    def add(self, state):
+        for position in self.positions(state):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.size += 1
+        if self.bound_exceeded_at is None and self.error_bound is not None and \
+                self.omission_probability() > self.error_bound:
+            self.bound_exceeded_at = self.size
+
+    def omission_probability(self):
+        """
+        :return: the estimated probability that a new state is wrongly considered visited
+        """
+        return (1 - math.exp(-self.hashes * self.size / self.nbits)) ** self.hashes
+
+    def capacity(self):
+        """
+        :return: the number of states the filter holds with the smallest omission probability for its hashes
+        """
+        return int(self.nbits * math.log(2) / self.hashes)
+
+    def nbytes(self):
+        return len(self.bits)
+
+    def __contains__(self, state):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(state))
+
+    def __len__(self):
+        return self.size
@@ -1,7 +1,13 @@
 import math
 from abc import ABC, abstractmethod
+import bisect
 import itertools
 
+try:
+    import numpy  # optional, only required by the NumpyStorageNFA
+except ImportError:
+    numpy = None
+
 
 class AbstractStorage(ABC):
     """abstract class for the storage of transducer transitions relations"""
@@ -41,6 +47,13 @@ class AbstractStorage(ABC):
     def __str__(self):
         pass
 
+    def target_index(self, alphabet_map):
+        """
+        :param alphabet_map: the alphabet map used to split transitions [x,y]
+        :return: the index of the transitions grouped by target symbol used by the step game
+        """
+        return TargetSymbolIndex(self, alphabet_map)
+
 
 class SimpleStorageNFA(AbstractStorage):
     """Stores the transition relation of an NFA (Non-deterministic Finite Automaton) in a hashtable"""
@@ -83,24 +96,330 @@ class SimpleStorageNFA(AbstractStorage):
         return result
 
 
+class ReadOnlyStorageError(Exception):
+    """Raised when a transition is added to a read only storage"""
+
+
+class CompiledStorageNFA(AbstractStorage):
+    """
+    Read only storage of the transition relation of an NFA in flat integer arrays (e.g. memoryviews of a memory-mapped
+    file). The transitions of the origin states[i] are stored at the positions offsets[i] to offsets[i + 1] of the
+    arrays symbols and targets, in the order in which they were added. The same positions of sorted_symbols and order
+    hold the symbols sorted by value and the positions of their transitions, so get_successors can bisect them. Use
+    copy_with_storage of the transducer to change it
+    """
+
+    def __init__(self, states, offsets, symbols, targets, sorted_symbols, order):
+        """
+        :param states: all origin states in the order of their transitions
+        :param offsets: the start of the transitions of each origin state, followed by the number of transitions
+        :param symbols: the symbol of each transition
+        :param targets: the target of each transition
+        :param sorted_symbols: the symbols of each origin state sorted by value
+        :param order: the position in symbols and targets of each entry of sorted_symbols
+        """
+        self.states = states
+        self.offsets = offsets
+        self.symbols = symbols
+        self.targets = targets
+        self.sorted_symbols = sorted_symbols
+        self.order = order
+        self.position = {state: i for (i, state) in enumerate(states)}  # maps an origin state to its index in states
+        self.state_count = len(symbols)
+
+    def add_transition(self, origin, symbol, target):
+        raise ReadOnlyStorageError("A CompiledStorageNFA is read only, copy the transducer to another storage first")
+
+    def get_successors(self, origin, symbol):
+        i = self.position.get(origin)
+        if i is None:
+            return None
+        start = bisect.bisect_left(self.sorted_symbols, symbol, self.offsets[i], self.offsets[i + 1])
+        end = bisect.bisect_right(self.sorted_symbols, symbol, start, self.offsets[i + 1])
+        return [self.targets[j] for j in self.order[start:end]] if start < end else None
+
+    def state_iterator(self):
+        return self.states
+
+    def transition_iterator(self, origin):
+        i = self.position.get(origin)
+        if i is None:
+            return
+        for j in range(self.offsets[i], self.offsets[i + 1]):
+            yield self.symbols[j], self.targets[j]
+
+    def __str__(self):
+        result = ""
+        for state in self.states:
+            for (symbol, target) in self.transition_iterator(state):
+                result += "state: " + str(state) + " symbol: " + str(symbol) + " target: " + str(target) + "\n"
+        return result
+
+
+class NumpyStorageNFA(SimpleStorageNFA):
+    """
+    Stores the transition relation of an NFA like the SimpleStorageNFA, but the step game selects the transitions of a
+    whole column prefix with a few vectorized NumPy operations (see NumpyTargetIndex). Requires numpy
+    """
+
+    def __init__(self, alphabet_map):
+        """
+        :param alphabet_map: the alphabet map used to split transitions [x,y]
+        """
+        if numpy is None:
+            raise ImportError("The NumpyStorageNFA requires numpy")
+        if alphabet_map.get_sigma_size() > 64:
+            raise ValueError("The NumpyStorageNFA supports at most 64 symbols")  # the bits of x are stored in an uint64
+        super().__init__()
+
+    def target_index(self, alphabet_map):
+        return NumpyTargetIndex(self, alphabet_map)
+
+
+class NumpyTargetIndex:
+    """
+    The TargetSymbolIndex of a NumpyStorageNFA. The transitions of all states are stored in flat arrays, grouped by
+    origin and sorted by y (stable, so the order in which transitions were added is kept). prefix_moves selects the
+    transitions of a column prefix whose y is not in the seperator with one vectorized mask, the moves are returned
+    in the same order as by the TargetSymbolIndex
+    """
+
+    max_prefixes = 1 << 12  # the memo of the prefix arrays is cleared when it holds more prefixes
+
+    def __init__(self, storage, alphabet_map):
+        """
+        :param storage: the NumpyStorageNFA capturing the transition relation
+        :param alphabet_map: the alphabet map used to split transitions [x,y]
+        """
+        self.ranges = {}  # maps an origin to the range of its transitions in the flat arrays
+        ys, x_bits, targets = [], [], []
+        for origin in storage.state_iterator():
+            transitions = sorted(storage.transition_iterator(origin), key=lambda s_p: alphabet_map.get_y(s_p[0]))
+            self.ranges[origin] = (len(ys), len(ys) + len(transitions))
+            for (x_y_int, target) in transitions:
+                ys.append(alphabet_map.get_y(x_y_int))
+                x_bits.append(1 << alphabet_map.get_x(x_y_int))
+                targets.append(target)
+        self.ys = numpy.array(ys, dtype=numpy.uint64)
+        self.x_bits = numpy.array(x_bits, dtype=numpy.uint64)
+        self.targets = numpy.array(targets, dtype=numpy.int64)
+        self.prefixes = {}  # maps a column prefix to the positions and prefix indices i of its transitions
+
+    def prefix_arrays(self, prefix):
+        """
+        :param prefix: a tuple of transducer states
+        :return: the positions of the transitions of the states of prefix in the flat arrays and the index i of their
+        origin in prefix
+        """
+        arrays = self.prefixes.get(prefix)
+        if arrays is None:
+            positions, indices = [], []
+            for (i, q) in enumerate(prefix):
+                (start, end) = self.ranges.get(q, (0, 0))
+                positions.extend(range(start, end))
+                indices.extend([i] * (end - start))
+            arrays = (numpy.array(positions, dtype=numpy.int64), numpy.array(indices, dtype=numpy.int64))
+            if len(self.prefixes) >= self.max_prefixes:
+                self.prefixes.clear()
+            self.prefixes[prefix] = arrays
+        return arrays
+
+    def prefix_moves(self, prefix, I):
+        """
+        See TargetSymbolIndex.prefix_moves
+        """
+        (positions, indices) = self.prefix_arrays(prefix)
+        selected = (numpy.uint64(I) >> self.ys[positions]) & numpy.uint64(1) == 0
+        positions = positions[selected]
+        return zip(indices[selected].tolist(), self.x_bits[positions].tolist(), self.targets[positions].tolist())
+
+
+class TargetSymbolIndex:
+    """
+    A frozen view on the transition relation of a transducer, where the transitions of every state are grouped by their
+    target symbol y. Every state additionally stores a bit map of all target symbols it uses.
+    => Used in the step game, where one bit operation with the seperator selects all transition groups that are allowed
+    """
+
+    empty_entry = (0, {})  # the entry of states without outgoing transitions
+
+    def __init__(self, storage, alphabet_map):
+        """
+        :param storage: the AbstractStorage object capturing the transition relation
+        :param alphabet_map: the alphabet map used to split transitions [x,y]
+        """
+        self.index = {}
+        for origin in storage.state_iterator():
+            groups = {}
+            for (x_y_int, target) in storage.transition_iterator(origin):
+                y_bit = 1 << alphabet_map.get_y(x_y_int)
+                groups.setdefault(y_bit, []).append((1 << alphabet_map.get_x(x_y_int), target))
+            used_y = 0
+            for y_bit in groups:
+                used_y |= y_bit
+            self.index[origin] = (used_y, {y_bit: tuple(groups[y_bit]) for y_bit in groups})
+
+    def get_entry(self, origin):
+        """
+        :param origin: a transducer state
+        :return: a pair (used_y, groups), where used_y is the bit map of all target symbols used by origin and groups
+        maps the bit of a target symbol y to a tuple of all pairs (bit of x, target) of transitions [x,y] of origin
+        """
+        return self.index.get(origin, self.empty_entry)
+
+    def prefix_moves(self, prefix, I):
+        """
+        :param prefix: a tuple of transducer states, e.g. the prefix c1[:l+1] of a column
+        :param I: the bit map of the seperator
+        :return: lazily returns (i, bit of x, target) for all transitions [x,y] of the states prefix[i] whose y is not
+        in I. They are ordered by i, then by y and then by the order in which the transitions were added
+        """
+        for (i, q) in enumerate(prefix):
+            (used_y, groups) = self.index.get(q, self.empty_entry)
+            open_y = used_y & ~I  # all target symbols y of q that are not in the seperator
+            while open_y:
+                y_bit = open_y & -open_y
+                open_y ^= y_bit
+                for (x_bit, p) in groups[y_bit]:
+                    yield i, x_bit, p
+
+
+class StateEncoder:
+    """
+    Collision free mixed-radix encoding of tuples of states, e.g. the states (q, p) of the pairing of two NFAs.
+    The i-th component of an encoded tuple has to be a state in range(radices[i])
+    """
+
+    def __init__(self, radices):
+        """
+        :param radices: the number of states of each component, e.g. [|Q_I|, |Q_B|]
+        """
+        self.radices = tuple(radices)
+        self.weights = []  # the weight of each component in the encoding
+        weight = 1
+        for radix in self.radices:
+            self.weights.append(weight)
+            weight *= radix
+        self.size = weight  # the number of different codes
+
+    def encode(self, states):
+        """
+        :param states: a list of states, one for each component
+        :return: the unique integer encoding of the states, e.g. [q, p] -> q + p * |Q_I|
+        """
+        code = 0
+        for (state, weight) in zip(states, self.weights):
+            code += state * weight
+        return code
+
+    def decode(self, code):
+        """
+        :param code: an integer encoding of a list of states
+        :return: the list of states encoded by code
+        """
+        states = []
+        for radix in self.radices:
+            code, state = divmod(code, radix)
+            states.append(state)
+        return states
+
+
+class SubsetEncoder:
+    """Collision free encoding of sets of states as bit maps, e.g. the states of a subset construction"""
+
+    @staticmethod
+    def encode(states):
+        """
+        :param states: an iterable of states
+        :return: the bit map of the set of states, e.g. [0, 2] -> 101
+        """
+        code = 0
+        for state in states:
+            code |= 1 << state
+        return code
+
+    @staticmethod
+    def decode(code):
+        """
+        :param code: a bit map of a set of states
+        :return: the sorted list of states in code
+        """
+        states = []
+        state = 0
+        while code:
+            if code & 1:
+                states.append(state)
+            code >>= 1
+            state += 1
+        return states
+
+
+class DenseEncoder:
+    """
+    Assigns dense integer ids 0, 1, 2, ... to arbitrary hashable states, e.g. the subsets of a subset construction.
+    Dense ids keep bit maps over the states of the resulting transducer small
+    """
+
+    def __init__(self, decoder=None):
+        """
+        :param decoder: an optional encoder used to decode the stored states further (e.g. a SubsetEncoder)
+        """
+        self.decoder = decoder
+        self.ids = {}  # maps a state to its id
+        self.states = []  # maps an id to its state
+
+    def encode(self, state):
+        """
+        :param state: a hashable state
+        :return: the id of state, a new id is assigned if the state has not been seen before
+        """
+        code = self.ids.get(state)
+        if code is None:
+            code = len(self.states)
+            self.ids[state] = code
+            self.states.append(state)
+        return code
+
+    def decode(self, code):
+        """
+        :param code: the id of a state
+        :return: the state with the id code
+        """
+        if self.decoder is None:
+            return self.states[code]
+        return self.decoder.decode(self.states[code])
+
+    def __len__(self):
+        return len(self.states)
+
+
 class ColumnMapping:
     """
-    Stores the string representation of hashed transducer states.
+    Stores the string representation of encoded transducer states.
     Used for debugging purposes only"
     """
 
-    def __init__(self, LSSF):
+    def __init__(self, LSSF, encoder=None):
         """
         Depending on LSSF maps lists [0, 1, 2] to 012 or 210
         :param LSSF: Least significant state first (in this case would map to 012)
+        :param encoder: a StateEncoder or SubsetEncoder used to decode states that were not stored explicitly
         """
         self.LSSF = LSSF
+        self.encoder = encoder
         self.mapping = {}
 
     def store_column(self, column_hash, column_list):
         """Maps [0, 1, 2] -> q0q1q2 and stores result in a map with key column_hash
-        :param column_hash: the hash value of a column
-        :param column_list: the list to be hashed
+        :param column_hash: the encoding of a column
+        :param column_list: the list of states encoded by column_hash
+        """
+        self.mapping[column_hash] = self.column_to_str(column_list)
+
+    def column_to_str(self, column_list):
+        """
+        :param column_list: a list of states
+        :return: the string representation of the list, e.g. [0, 1, 2] -> q0q1q2
         """
         column_str = ""
         for entry in column_list:
@@ -108,13 +427,15 @@ class ColumnMapping:
                 column_str = column_str + "q" + str(entry)
             else:
                 column_str = "q" + str(entry) + column_str
-        self.mapping[column_hash] = column_str
+        return column_str
 
     def get_column_str(self, column_hash):
         """
-        :param column_hash: the hash value of a column
+        :param column_hash: the encoding of a column
         :return: returns the string representation of the column state encoded by column_hash
         """
+        if column_hash not in self.mapping and self.encoder is not None:
+            self.store_column(column_hash, self.encoder.decode(column_hash))
         return self.mapping[column_hash]
 
 
@@ -0,0 +1,69 @@
+"""Compares the storage backends of T (SimpleStorageNFA and NumpyStorageNFA) on the benchmarks"""
+import Algorithms
+import Main
+import ModelCache
+import argparse
+import random
+import time
+
+
+def time_prefix_moves(T, samples, seed=0):
+    """
+    Times the selection of the moves of random column prefixes and seperators, the core operation of the step game
+    :param T: the transducer T
+    :param samples: the number of prefixes
+    :param seed: the seed of the random prefixes
+    :return: the number of selected moves and the elapsed time in seconds
+    """
+    generator = random.Random(seed)
+    states = list(T.state_iterator())
+    sigma = T.get_alphabet_map().get_bit_map_sigma()
+    queries = [(tuple(generator.sample(states, generator.randint(1, len(states)))), generator.randint(0, sigma))
+               for _ in range(samples)]
+    index = T.get_target_index()
+    start_time = time.time()
+    moves = 0
+    for (prefix, I) in queries:
+        for _ in index.prefix_moves(prefix, I):
+            moves += 1
+    return moves, time.time() - start_time
+
+
+def time_oneshot(T, IxB, gen_name, oneshot_name, ignore_ambiguous, timeout):
+    """
+    :return: the statistics of oneshot and the elapsed time in seconds, or None if oneshot timed out
+    """
+    o = Algorithms.OneshotSmart(IxB, T)
+    o.ignore_ambiguous = ignore_ambiguous
+    start_time = time.time()
+    (status, _) = Main.try_one(o, getattr(o, Main.oneshot_implementations[oneshot_name]), timeout,
+                               Main.gen_implementations[gen_name])
+    if status != "done":
+        return None
+    return o.statistics(), time.time() - start_time
+
+
+"""Run oneshot with every storage backend of T and compare the times"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares the storage backends of T on the benchmarks")
+    parser.add_argument("--generator", default="buffer_bfs", choices=Main.gen_implementations)
+    parser.add_argument("--oneshot", default="bfs", choices=["dfs", "bfs"])
+    parser.add_argument("--timeout", type=int, default=60, help="time limit per run in seconds")
+    parser.add_argument("--samples", type=int, default=100000, help="number of random prefixes per transducer")
+    args = parser.parse_args()
+
+    for benchmark_name, testcases in Main.benchmarks:
+        rts = ModelCache.load_rts(benchmark_name)
+        transducers = {name: rts.get_T().copy_with_storage(backend(rts.alphabet_map))
+                       for (name, backend) in Main.storage_implementations.items()}
+        for (name, T) in transducers.items():
+            (moves, elapsed) = time_prefix_moves(T, args.samples)
+            print(f'{benchmark_name} {name}: {args.samples} prefixes, {moves} moves in {elapsed:.3f}s')
+        for test in testcases:
+            for (name, T) in transducers.items():
+                result = time_oneshot(T, rts.get_IxB(test), args.generator, args.oneshot, True, args.timeout)
+                if result is None:
+                    print(f'{benchmark_name}/{test} {name}: timeout')
+                else:
+                    print(f'{benchmark_name}/{test} {name}: # states: {result[0]["states"]} elapsed_time: '
+                          f'{result[1]:.3f}')
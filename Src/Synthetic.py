@@ -0,0 +1,242 @@
+"""
+Generates regular transition systems of a configurable size in the .json format of the benchmarks and measures how the
+oneshot implementations scale with the size (sweep)
+"""
+import Main
+import ModelCache
+import Results
+import Runner
+import argparse
+import json
+import os
+import random
+
+SYNTHETIC_DIR = "synthetic"  # relative to the folder benchmark, the generated files are loaded like the benchmarks
+
+
+def nfa(states, initial, accepting, transitions):
+    """
+    :param states: the names of the states, they are renamed to q0, q1, ... in this order like in the benchmarks
+    :param transitions: a list of (origin, target, letter)
+    :return: the NFA in the format of the benchmarks
+    """
+    names = {state: f'q{i}' for (i, state) in enumerate(states)}
+    return {"states": list(names.values()), "initialState": names[initial],
+            "acceptingStates": [names[state] for state in accepting],
+            "transitions": [{"origin": names[origin], "target": names[target], "letter": letter}
+                            for (origin, target, letter) in transitions]}
+
+
+def none_nfa(alphabet, letters):
+    """
+    :return: an NFA of all words that do not contain any letter of letters
+    """
+    return nfa(["q0"], "q0", ["q0"], [("q0", "q0", x) for x in alphabet if x not in letters])
+
+
+def count_nfa(alphabet, requirements):
+    """
+    :param requirements: a list of (letters, n), disjoint sets of letters and their minimal number of occurrences
+    :return: an NFA of all words that contain at least n letters of letters for every requirement
+    """
+    counts = [()]
+    for (_, n) in requirements:
+        counts = [count + (i,) for count in counts for i in range(n + 1)]
+
+    def name(count):
+        return "q" + "_".join(map(str, count))
+
+    transitions = []
+    for count in counts:
+        for x in alphabet:
+            target = tuple(min(i + (x in letters), n) for (i, (letters, n)) in zip(count, requirements))
+            transitions.append((name(count), name(target), x))
+    final = tuple(n for (_, n) in requirements)
+    return nfa([name(count) for count in counts], name(counts[0]), [name(final)], transitions)
+
+
+def random_nfa(alphabet, states, density, rng):
+    """
+    :param density: the probability of every possible transition
+    :return: an NFA with the given number of states and random transitions and accepting states
+    """
+    names = [f'q{i}' for i in range(states)]
+    accepting = [q for q in names if rng.random() < 0.5] or [rng.choice(names)]
+    return nfa(names, "q0", accepting, [(p, q, x) for p in names for x in alphabet for q in names
+                                        if rng.random() < density])
+
+
+def token_ring(alphabet_size, states, density, properties, rng):
+    """
+    Token passing with alphabet_size - 1 colors of tokens: a token is passed states - 2 positions to the right and may
+    change its color. With the probability density a token may also be passed fewer positions. Initially there is one
+    token. The properties are "no token" and "at least k + 1 tokens" for k = 1, ..., properties - 1, none of them is
+    reachable
+    """
+    tokens = [f't{i}' for i in range(1, max(2, alphabet_size))]
+    alphabet = ["n"] + tokens
+    steps = [f'p{i}' for i in range(1, max(3, states) - 1)]
+    transitions = [("q0", "q0", "n,n"), ("qf", "qf", "n,n")]
+    transitions += [("q0", steps[0], f'{t},n') for t in tokens]
+    transitions += [(p, q, "n,n") for (p, q) in zip(steps, steps[1:])]
+    transitions += [(steps[-1], "qf", f'n,{t}') for t in tokens]
+    transitions += [(p, "qf", f'n,{t}') for p in steps[:-1] for t in tokens if rng.random() < density]  # shortcuts
+    props = {"notoken": none_nfa(alphabet, tokens)}
+    for k in range(1, properties):
+        props[f'token{k + 1}'] = count_nfa(alphabet, [(tokens, k + 1)])
+    return {"alphabet": alphabet,
+            "initial": nfa(["q0", "q1"], "q0", ["q1"], [("q0", "q0", "n"), ("q0", "q1", tokens[0]),
+                                                        ("q1", "q1", "n")]),
+            "transducer": nfa(["q0"] + steps + ["qf"], "q0", ["qf"], transitions),
+            "properties": props}
+
+
+def mutex(alphabet_size, states, density, properties, rng):
+    """
+    Mutual exclusion: a process is idle (i), waits in alphabet_size - 2 stages (w1, w2, ...), enters the critical
+    section (c) if no other process is in it and returns to idle. With the probability density a waiting process may
+    skip a stage. The transducer has a fixed number of states. Initially all processes are idle. The properties are
+    "at least two processes are critical and at least k are waiting" for k = 0, ..., properties - 1, none of them is
+    reachable. Oneshot only proves them for a single waiting stage, more stages show when it fails
+    """
+    waiting = [f'w{i}' for i in range(1, max(3, alphabet_size) - 1)]
+    alphabet = ["i"] + waiting + ["c"]
+    moves = [("i", waiting[0]), ("c", "i")] + list(zip(waiting, waiting[1:]))
+    moves += [(w, v) for (w, v) in zip(waiting, waiting[2:]) if rng.random() < density]  # skipped stages
+    free = [x for x in alphabet if x != "c"]
+    transitions = [("q0", "q0", f'{x},{x}') for x in free] + [("q0", "qc", "c,c")]
+    transitions += [("qc", "qc", f'{x},{x}') for x in alphabet] + [("qf", "qf", f'{x},{x}') for x in alphabet]
+    transitions += [(q, "qf", f'{x},{y}') for q in ("q0", "qc") for (x, y) in moves]
+    transitions += [("q0", "qe", f'{waiting[-1]},c')] + [("qe", "qe", f'{x},{x}') for x in free]  # guarded entry
+    return {"alphabet": alphabet,
+            "initial": nfa(["q0", "q1"], "q0", ["q1"], [("q0", "q1", "i"), ("q1", "q1", "i")]),
+            "transducer": nfa(["q0", "qc", "qe", "qf"], "q0", ["qe", "qf"], transitions),
+            "properties": {f'nomutex{k}': count_nfa(alphabet, [(["c"], 2)] + [(waiting, k)] * (k > 0))
+                           for k in range(max(1, properties))}}
+
+
+def random_rts(alphabet_size, states, density, properties, rng):
+    """
+    A random transducer with states states in which every possible transition exists with the probability density,
+    a random I and random properties with three states each and half of the possible transitions. The verdicts are not
+    known in advance
+    """
+    alphabet = [f'a{i}' for i in range(max(1, alphabet_size))]
+    letters = [f'{x},{y}' for x in alphabet for y in alphabet]
+    return {"alphabet": alphabet,
+            "initial": random_nfa(alphabet, 3, 0.5, rng),
+            "transducer": random_nfa(letters, max(1, states), density, rng),
+            "properties": {f'random{k}': random_nfa(alphabet, 3, 0.5, rng) for k in range(max(1, properties))}}
+
+
+families = {"token_ring": token_ring, "mutex": mutex, "random": random_rts}
+
+
+def generate(family, alphabet_size, states, density, properties, seed=0):
+    """
+    Writes a generated RTS to the folder benchmark/synthetic
+    :param family: the name of a family in families
+    :param alphabet_size: the number of letters
+    :param states: the number of states of the transducer (not used by mutex)
+    :param density: the probability of the optional transitions of the family
+    :param properties: the number of properties
+    :param seed: the seed of the random choices
+    :return: the name of the file relative to the folder benchmark (see Automata.RTS) and its properties
+    """
+    parameters = {"alphabet": alphabet_size, "states": states, "density": density, "properties": properties,
+                  "seed": seed}
+    rts = families[family](alphabet_size, states, density, properties, random.Random(seed))
+    rts = dict({"description": f'Synthetic {family} RTS {parameters}', "deadlockThreshold": 2}, **rts)
+    filename = f'{SYNTHETIC_DIR}/{family}-a{alphabet_size}-s{states}-d{density}-p{properties}-r{seed}.json'
+    os.makedirs(f'benchmark/{SYNTHETIC_DIR}', exist_ok=True)
+    with open(f'benchmark/{filename}', 'w') as file:
+        json.dump(rts, file, indent=2)
+    return filename, list(rts["properties"])
+
+
+def sweep(family, parameters, vary, values, configuration_list, workers=None, timeout=Main.max_time,
+          memory_limit=None, output=None):
+    """
+    Runs every configuration on the RTS of family for every value of the parameter vary
+    :param parameters: the keyword arguments of generate, the parameter vary is replaced by each of values
+    :param configuration_list: list of (generator, oneshot implementation, ignore ambiguous), e.g. Main.configurations
+    :param output: if set, the records are appended to this file with the parameters of their RTS
+    :return: the records of all runs
+    """
+    benchmark_list = []
+    sizes = {}  # maps a generated file to its value of vary
+    for value in values:
+        (filename, testcases) = generate(family, **dict(parameters, **{vary: value}))
+        ModelCache.load_rts(filename)  # compile once before the jobs load the file concurrently
+        benchmark_list.append((filename, testcases))
+        sizes[filename] = value
+    records = []
+    for record in Runner.run_jobs(Runner.benchmark_jobs(benchmark_list, configuration_list), workers, timeout,
+                                  memory_limit):
+        record["parameters"] = dict(parameters, **{vary: sizes[record["benchmark"]]}, family=family)
+        print(f'{vary}={sizes[record["benchmark"]]} {Runner.record_to_str(record)}', flush=True)
+        if output is not None:
+            Results.write_record(output, record)
+        records.append(record)
+    return records
+
+
+def sweep_table(records, vary):
+    """
+    :return: a table of the total time and the maximal peak memory of each configuration (columns) for each value of
+    vary (rows), a configuration that did not finish a run is marked with its status
+    """
+    configurations = sorted({(r["generator"], r["oneshot"], r["ignore_ambiguous"]) for r in records}, key=str)
+    values = sorted({r["parameters"][vary] for r in records})
+    lines = [f'{vary:>10} ' + " ".join(f'{g}/{o}/{str(i)[0]:>1}'.rjust(26) for (g, o, i) in configurations)]
+    for value in values:
+        cells = []
+        for configuration in configurations:
+            runs = [r for r in records if r["parameters"][vary] == value and
+                    (r["generator"], r["oneshot"], r["ignore_ambiguous"]) == configuration]
+            failed = [r["status"] for r in runs if r["status"] != "done"]
+            if failed:
+                cells.append(failed[0].rjust(26))
+                continue
+            states = sum(r["states"] for r in runs)
+            memory = max((r["peak_rss"] or 0) for r in runs) / 1024 / 1024
+            cells.append(f'{states}st {sum(map(Results.record_time, runs)):.2f}s {memory:.0f}MB'.rjust(26))
+        lines.append(f'{value:>10} ' + " ".join(cells))
+    return "\n".join(lines)
+
+
+"""Generate a synthetic RTS or sweep over the size of a family"""
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates synthetic RTS and measures the scaling of oneshot")
+    parser.add_argument("command", choices=["generate", "sweep"])
+    parser.add_argument("--family", default="token_ring", choices=families)
+    parser.add_argument("--alphabet", type=int, default=2, help="number of letters")
+    parser.add_argument("--states", type=int, default=3, help="number of states of the transducer")
+    parser.add_argument("--density", type=float, default=0.0, help="probability of the optional transitions")
+    parser.add_argument("--properties", type=int, default=2, help="number of properties")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random choices")
+    parser.add_argument("--vary", default="states", choices=["alphabet", "states", "density", "properties"],
+                        help="the parameter of the sweep")
+    parser.add_argument("--values", nargs="+", default=["3", "4", "5", "6", "8", "10"],
+                        help="the values of the parameter of the sweep")
+    parser.add_argument("--generator", nargs="*", default=None, choices=Main.gen_implementations,
+                        help="only sweep these generators (default: all of Main.configurations)")
+    parser.add_argument("--workers", type=int, default=1, help="number of parallel jobs of the sweep")
+    parser.add_argument("--timeout", type=int, default=60, help="wall-clock limit per job in seconds")
+    parser.add_argument("--memory", type=int, default=None, help="memory limit per job in MB")
+    parser.add_argument("--output", default=None, help="append the record of each job to this .jsonl file")
+    args = parser.parse_args()
+
+    arguments = {"alphabet_size": args.alphabet, "states": args.states, "density": args.density,
+                 "properties": args.properties, "seed": args.seed}
+    if args.command == "generate":
+        (generated, names) = generate(args.family, **arguments)
+        print(f'benchmark/{generated}: {", ".join(names)}')
+    else:
+        vary_argument = {"alphabet": "alphabet_size"}.get(args.vary, args.vary)
+        sweep_values = [(float if args.vary == "density" else int)(value) for value in args.values]
+        sweep_configurations = [configuration for configuration in Main.configurations
+                                if args.generator is None or configuration[0] in args.generator]
+        sweep_records = sweep(args.family, arguments, vary_argument, sweep_values, sweep_configurations, args.workers,
+                              args.timeout, None if args.memory is None else args.memory * 1024 * 1024, args.output)
+        print(sweep_table(sweep_records, vary_argument))
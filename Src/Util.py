@@ -1,4 +1,5 @@
 """Different helper functions for the one_shot implementations"""
+from array import array
 
 
 class Triple:
@@ -73,3 +74,139 @@ def optional_list(l):
     if l is None:
         return []
     return l
+
+
+class ColumnTable:
+    """
+    Hash-consing table for columns (lists of T states). Every distinct column is stored once and identified by a dense
+    integer id, such that the oneshot search and the step game can work on ints instead of rebuilding tuples.
+    The columns are stored packed into bytes (one byte per state, or four if T has more than 256 states) together with
+    the bit map of their states, which answers membership and subset tests with one mask operation.
+    Note, that columns never contain a state twice
+    """
+
+    def __init__(self):
+        self.typecode = "B"  # the array typecode of the packed columns, widened if a state does not fit
+        self.columns = []  # maps the id of a column to its packed states
+        self.masks = []  # maps the id of a column to the bit map of its states
+        self.extensions = []  # maps the id of a column to a dict p -> id of the column extended by p
+        self.ids = {}  # maps the packed states of a column to its id
+        self.empty = self.intern(())  # the id of the empty column
+
+    def pack(self, column):
+        """
+        :param column: a list or tuple of T states
+        :return: the states packed into bytes
+        """
+        try:
+            return array(self.typecode, column).tobytes()
+        except OverflowError:
+            self.typecode = "I"
+            self.columns = [array("I", array("B", packed)).tobytes() for packed in self.columns]
+            self.ids = {packed: column_id for (column_id, packed) in enumerate(self.columns)}
+            return array(self.typecode, column).tobytes()
+
+    def intern(self, column):
+        """
+        :param column: a list or tuple of T states
+        :return: the id of the column, a new id is assigned if the column has not been seen before
+        """
+        packed = self.pack(column)
+        column_id = self.ids.get(packed)
+        if column_id is None:
+            column_id = len(self.columns)
+            mask = 0
+            for q in column:
+                mask |= 1 << q
+            self.columns.append(packed)
+            self.masks.append(mask)
+            self.extensions.append({})
+            self.ids[packed] = column_id
+        return column_id
+
+    def extend(self, column_id, p):
+        """
+        :param column_id: the id of a column c
+        :param p: a T state that is not contained in c
+        :return: the id of the column c + [p]
+        """
+        extended_id = self.extensions[column_id].get(p)
+        if extended_id is None:
+            extended_id = self.intern(self.get_column(column_id) + (p,))
+            self.extensions[column_id][p] = extended_id
+        return extended_id
+
+    def contains(self, column_id, p):
+        """
+        :param column_id: the id of a column c
+        :param p: a T state
+        :return: true if p is in c
+        """
+        return (self.masks[column_id] >> p) & 1 == 1
+
+    def get_mask(self, column_id):
+        """
+        :param column_id: the id of a column
+        :return: the bit map of the states of the column
+        """
+        return self.masks[column_id]
+
+    def get_column(self, column_id):
+        """
+        :param column_id: the id of a column
+        :return: the column as a tuple of T states
+        """
+        if self.typecode == "B":
+            return tuple(self.columns[column_id])
+        return tuple(array(self.typecode, self.columns[column_id]))
+
+    def __len__(self):
+        return len(self.columns)
+
+
+class VisitedColumns:
+    """
+    Keeps track of the ids of all winning states d of a step game.
+    Membership tests are hashed and the columns are kept in the order in which they were won.
+    It also keeps the positions (l, I, c2) that were expanded in the game, since an expanded position cannot win a
+    column that has not been won already
+    """
+
+    def __init__(self):
+        self.columns = {}  # the ids of the winning columns, the dict preserves the insertion order
+        self.frozen = ()  # the last snapshot of the winning columns
+        self.expanded = set()  # the positions (l, I, c2) of the game that were expanded
+
+    def expand(self, position):
+        """
+        :param position: a position (l, I, c2) of the step game
+        :return: false if the position was already expanded in this game, otherwise it is marked as expanded
+        """
+        if position in self.expanded:
+            return False
+        self.expanded.add(position)
+        return True
+
+    def add(self, column_id):
+        """
+        :param column_id: the id of a winning column d
+        """
+        self.columns[column_id] = None
+
+    def snapshot(self):
+        """
+        :return: an immutable copy of all winning column ids in the order in which they were won.
+        The copy is shared until a new column is added
+        """
+        if len(self.frozen) != len(self.columns):
+            self.frozen = tuple(self.columns)
+        return self.frozen
+
+    def __contains__(self, column_id):
+        return column_id in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
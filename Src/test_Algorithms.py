@@ -0,0 +1,223 @@
+"""
+Tests of the oneshot implementations (see Algorithms.py)
+"""
+import Algorithms
+import Automata
+import Main
+import Runner
+import Util
+import contextlib
+import inspect
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# properties whose search takes at most a few seconds
+quick_benchmarks = [("Burns.json", ["nomutex"]), ("bakery.json", ["nomutex"]),
+                    ("synapse.json", ["dirtydirty", "dirtyvalid"]),
+                    ("dining-cryptographers.json", ["internal", "external"]),
+                    ("token-passing.json", ["manytoken", "notoken", "onetoken"])]
+# properties whose search takes less than a second
+small_benchmarks = [("bakery.json", ["nomutex"]), ("synapse.json", ["dirtydirty", "dirtyvalid"]),
+                    ("token-passing.json", ["manytoken", "notoken", "onetoken"])]
+# the properties of quick_benchmarks that oneshot disproves
+disproved = {("token-passing.json", "onetoken")}
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+def oneshot(rts, IxB, oneshot_name, gen_name="buffer_bfs", ignore_ambiguous=True):
+    """
+    :return: the OneshotSmart object of the search and its result
+    """
+    o = Algorithms.OneshotSmart(IxB, rts.get_T())
+    o.ignore_ambiguous = ignore_ambiguous
+    result = getattr(o, "oneshot_" + oneshot_name)(Main.gen_implementations[gen_name])
+    return o, result
+
+
+class TestStepGames(unittest.TestCase):
+
+    def test_verdicts_of_the_step_game_generators(self):
+        for (benchmark_name, testcases) in quick_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                for gen_name in ("buffer_bfs", "buffer_dfs"):
+                    (_, result) = oneshot(rts, rts.get_IxB(test), "bfs", gen_name)
+                    self.assertEqual(result is not None, (benchmark_name, test) in disproved,
+                                     (benchmark_name, test, gen_name))
+
+    def test_repeated_positions_are_skipped(self):
+        explored = {("bakery.json", "nomutex"): 58, ("synapse.json", "dirtydirty"): 94,
+                    ("synapse.json", "dirtyvalid"): 124, ("token-passing.json", "manytoken"): 12,
+                    ("token-passing.json", "notoken"): 7, ("token-passing.json", "onetoken"): 8}
+        for (benchmark_name, testcases) in small_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                for ignore_ambiguous in (False, True):
+                    (o, _) = oneshot(rts, rts.get_IxB(test), "bfs", "buffer_bfs", ignore_ambiguous)
+                    self.assertEqual(o.expl_states, explored[(benchmark_name, test)], (benchmark_name, test))
+                    self.assertEqual(o.statistics()["saved_expansions"] > 0, benchmark_name != "token-passing.json",
+                                     (benchmark_name, test))
+
+
+class TestDfs(unittest.TestCase):
+
+    def test_verdicts_like_bfs(self):
+        for (benchmark_name, testcases) in small_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                for gen_name in ("buffer_bfs", "buffer_dfs"):
+                    for ignore_ambiguous in (False, True):
+                        (_, result) = oneshot(rts, rts.get_IxB(test), "dfs", gen_name, ignore_ambiguous)
+                        self.assertEqual(result is not None, (benchmark_name, test) in disproved,
+                                         (benchmark_name, test, gen_name, ignore_ambiguous))
+
+    def test_depth_is_not_limited_by_the_recursion_limit(self):
+        rts = Automata.RTS("Burns.json")
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(len(inspect.stack()) + 30)  # less than the frames of a recursive dfs of Burns
+        try:
+            (_, result) = oneshot(rts, rts.get_IxB("nomutex"), "dfs")
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertIsNone(result)
+
+
+class TestStepGameCache(unittest.TestCase):
+
+    def evicted(self, policy, uses):
+        """
+        Adds the games 0, 1 and 2 with the costs 3, 1 and 2 to a cache of two entries, looking up the games in uses
+        after the first two were added
+        :return: the games that were evicted
+        """
+        cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable(), capacity=2, policy=policy)
+        gs = Util.Triple(0, 0, 0)
+        for (c, cost) in ((0, 3), (1, 1)):
+            cache.add_entry(c, gs, 0, 0, (c,), cost)
+        for c in uses:
+            self.assertEqual(cache.get_entry(c, gs, 0, 0), (c,))
+        cache.add_entry(2, gs, 0, 0, (2,), 2)
+        self.assertEqual(cache.evictions, 1)
+        return [c for c in range(3) if cache.get_entry(c, gs, 0, 0) is None]
+
+    def test_eviction_policies(self):
+        self.assertEqual(self.evicted("lru", [0]), [1])
+        self.assertEqual(self.evicted("lru", [1]), [0])
+        self.assertEqual(self.evicted("lfu", []), [0])  # the older of the least frequently used games
+        self.assertEqual(self.evicted("lfu", [0]), [1])
+        self.assertEqual(self.evicted("lfu", [0, 1]), [2])
+        self.assertEqual(self.evicted("cost", [1, 1]), [1])
+
+    def test_verdicts_with_a_bounded_cache(self):
+        for (benchmark_name, testcases) in small_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                for policy in Algorithms.OneshotSmart.StepGameCache.policies:
+                    o = Algorithms.OneshotSmart(rts.get_IxB(test), rts.get_T(), cache_capacity=8, cache_policy=policy)
+                    result = o.oneshot_bfs(Main.gen_implementations["buffer_bfs"])
+                    self.assertEqual(result is not None, (benchmark_name, test) in disproved, (benchmark_name, test))
+                    self.assertLessEqual(len(o.step_cache.cache), 8)
+
+    def test_shared_cache_keeps_the_verdicts(self):
+        for (benchmark_name, testcases) in small_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            step_cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable())
+            shared_hits = 0
+            for test in testcases:
+                o = Algorithms.OneshotSmart(rts.get_IxB(test), rts.get_T(), step_cache=step_cache)
+                result = o.oneshot_bfs(Main.gen_implementations["buffer_bfs"])
+                self.assertEqual(result is not None, (benchmark_name, test) in disproved, (benchmark_name, test))
+                shared_hits += o.statistics()["cache_shared_hits"]
+            self.assertEqual(shared_hits > 0, len(testcases) > 1, benchmark_name)
+
+    def test_execute_benchmarks_bounds_the_shared_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "records.jsonl")
+            with contextlib.redirect_stdout(io.StringIO()):
+                Main.execute_benchmarks(small_benchmarks, "buffer_bfs", "bfs", True, output=output, cache_capacity=8,
+                                        cache_policy="lfu")
+            with open(output) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), sum(len(testcases) for (_, testcases) in small_benchmarks))
+        for record in records:
+            self.assertEqual(record["verdict"], "x" if (record["benchmark"], record["property"]) in disproved else "✓")
+            self.assertLessEqual(record["cache_size"], 8)
+            self.assertEqual(record["cache"], {"cache_capacity": 8, "cache_policy": "lfu"})
+
+    def test_shared_cache_rejects_another_T(self):
+        step_cache = Algorithms.OneshotSmart.StepGameCache(Util.ColumnTable())
+        rts = Automata.RTS("token-passing.json")
+        Algorithms.OneshotSmart(rts.get_IxB("notoken"), rts.get_T(), step_cache=step_cache)
+        with self.assertRaises(ValueError):
+            Algorithms.OneshotSmart(rts.get_IxB("notoken"), Automata.RTS("token-passing.json").get_T(),
+                                    step_cache=step_cache)
+
+
+class TestBackwardPruning(unittest.TestCase):
+
+    def test_verdicts_like_the_unpruned_search(self):
+        for (benchmark_name, testcases) in small_benchmarks + [("dining-cryptographers.json", ["external"])]:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                for oneshot_name in ("bfs", "dfs"):
+                    o = Algorithms.OneshotSmart(rts.get_IxB(test), rts.get_T())
+                    o.backward_pruning = True
+                    result = getattr(o, "oneshot_" + oneshot_name)(Main.gen_implementations["buffer_bfs"])
+                    self.assertEqual(result is not None, (benchmark_name, test) in disproved,
+                                     (benchmark_name, test, oneshot_name))
+
+    def test_dead_initial_pairs(self):
+        for (benchmark_name, test) in (("journey-to-jerusalem.json", "justplayers"), ("token-passing.json", "equal")):
+            for lazy_pairing in (False, True):
+                rts = Automata.RTS(benchmark_name, lazy_pairing=lazy_pairing)
+                o = Algorithms.OneshotSmart(rts.get_IxB(test), rts.get_T())
+                o.backward_pruning = True
+                self.assertIsNone(o.oneshot_bfs(Main.gen_implementations["buffer_bfs"]), (benchmark_name, test))
+                self.assertEqual(o.expl_states, 0, (benchmark_name, test, lazy_pairing))
+
+    def test_prunes_dead_states(self):
+        rts = Automata.RTS("dining-cryptographers.json")
+        (unpruned, _) = oneshot(rts, rts.get_IxB("external"), "bfs")
+        o = Algorithms.OneshotSmart(rts.get_IxB("external"), rts.get_T())
+        o.backward_pruning = True
+        self.assertIsNone(o.oneshot_bfs(Main.gen_implementations["buffer_bfs"]))
+        self.assertGreater(o.pruned_states, 0)
+        self.assertLess(o.expl_states, unpruned.expl_states)
+
+
+class TestReduce(unittest.TestCase):
+
+    def test_verdicts_like_the_unreduced_transducers(self):
+        for (benchmark_name, testcases) in quick_benchmarks:
+            for test in testcases:
+                job = {"benchmark": benchmark_name, "property": test, "generator": "buffer_bfs", "oneshot": "bfs",
+                       "ignore_ambiguous": True}
+                reduced = Runner.execute_job(dict(job, reduce=True))
+                self.assertEqual(reduced["verdict"], Runner.execute_job(job)["verdict"], (benchmark_name, test))
+                self.assertLessEqual(reduced["reduction"]["T"][-1][1], reduced["reduction"]["T"][0][1])
+
+
+class TestMultiDisprove(unittest.TestCase):
+
+    def test_results_like_single_properties(self):
+        for (benchmark_name, testcases) in quick_benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            o = Algorithms.OneshotSmart(rts.get_multi_pairing(testcases), rts.get_T())
+            results = o.multi_disprove_oneshot(Main.gen_implementations["buffer_bfs"])
+            self.assertEqual(set(results), set(testcases))
+            for test in testcases:
+                (_, result) = oneshot(rts, rts.get_IxB(test), "bfs")
+                self.assertEqual(results[test] is None, result is None, (benchmark_name, test))
+                if result is not None:
+                    self.assertIn(test, o.disproved_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
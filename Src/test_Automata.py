@@ -0,0 +1,187 @@
+"""
+Tests of the transducers of an RTS (see Automata.py)
+"""
+import Automata
+import Main
+import Runner
+import itertools
+import os
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+def successor_subset(transducer, subset, x_y_int):
+    return frozenset(p for q in subset for (symbol, p) in transducer.get_transitions(q) if symbol == x_y_int)
+
+
+def language_difference(expected, transducer, is_final=None):
+    """
+    Explores the pairs of subsets of states of both transducers that are reached by the same word
+    :param is_final: decides if a state of transducer is final, by default its final states
+    :return: a word that is accepted by only one of the transducers, or None if they accept the same language
+    """
+    finals = set(expected.get_final_states())
+    is_final = is_final or set(transducer.get_final_states()).__contains__
+    sigma_size = expected.get_alphabet_map().get_sigma_size()
+    initial = (frozenset(expected.get_initial_states()), frozenset(transducer.get_initial_states()))
+    words = {initial: ()}
+    work_list = [initial]
+    while work_list:
+        (subset, other_subset) = pair = work_list.pop()
+        if bool(subset & finals) != any(map(is_final, other_subset)):
+            return words[pair]
+        for x_y_int in range(sigma_size * sigma_size):
+            successor = (successor_subset(expected, subset, x_y_int),
+                         successor_subset(transducer, other_subset, x_y_int))
+            if successor not in words:
+                words[successor] = words[pair] + (x_y_int,)
+                work_list.append(successor)
+    return None
+
+
+def product(rts, test):
+    """
+    :return: the pairing of I and B of the property test over all pairs of states that are reachable from the initial
+    pair, without removing the dead pairs
+    """
+    (I, B) = (rts.get_I(), rts.get_B(test))
+    alphabet_map = I.get_alphabet_map()
+    pairing = Automata.NFATransducer(alphabet_map)
+    initial = (I.get_initial_states()[0], B.get_initial_states()[0])
+    ids = {initial: 0}  # maps a pair of states to its state in the pairing
+    pairing.add_initial_state(0)
+    work_list = [initial]
+    while work_list:
+        (q1, q2) = pair = work_list.pop()
+        if I.is_final_state(q1) and B.is_final_state(q2):
+            pairing.add_final_state(ids[pair])
+        for (x_x_int, p1) in I.get_transitions(q1):
+            for (y_y_int, p2) in B.get_transitions(q2):
+                if (p1, p2) not in ids:
+                    ids[(p1, p2)] = len(ids)
+                    work_list.append((p1, p2))
+                x_y_int = alphabet_map.combine_x_and_y(alphabet_map.get_x(x_x_int), alphabet_map.get_x(y_y_int))
+                pairing.add_transition(ids[pair], x_y_int, ids[(p1, p2)])
+    return pairing
+
+
+class TestMinimize(unittest.TestCase):
+
+    def test_preserve_the_language(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            transducers = [("T", rts.get_T()), ("I", rts.get_I())]
+            transducers += [(test, rts.get_IxB(test)) for test in testcases]
+            for (name, transducer) in transducers:
+                dfa = transducer.nfa_to_dfa()
+                self.assertTrue(dfa.is_deterministic(), (benchmark_name, name))
+                self.assertIsNone(language_difference(transducer, dfa), (benchmark_name, name, "nfa_to_dfa"))
+                self.assertIsNone(language_difference(transducer, transducer.minimize()),
+                                  (benchmark_name, name, "minimize"))
+
+    def test_minimize_is_minimal(self):
+        T = Automata.RTS("token-passing.json").get_T()
+        minimal = T.minimize()
+        self.assertEqual(len(list(minimal.minimize().state_iterator())), len(list(minimal.state_iterator())))
+
+
+class TestReduce(unittest.TestCase):
+
+    def test_preserves_the_language(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for (name, transducer) in [("T", rts.get_T())] + [(test, rts.get_IxB(test)) for test in testcases]:
+                (reduced, report) = transducer.reduce()
+                self.assertLessEqual(report[-1][1], report[0][1], (benchmark_name, name))
+                self.assertIsNone(language_difference(transducer, reduced), (benchmark_name, name))
+
+
+class TestPairing(unittest.TestCase):
+
+    def test_accepts_the_language_of_the_product(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                self.assertIsNone(language_difference(product(rts, test), rts.get_IxB(test)), (benchmark_name, test))
+
+    def test_every_pair_reaches_a_final_pair(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                IxB = rts.get_IxB(test)
+                live = set(IxB.get_final_states())
+                changed = True
+                while changed:
+                    changed = False
+                    for q in IxB.state_iterator():
+                        if q not in live and any(p in live for (_, p) in IxB.get_transitions(q)):
+                            live.add(q)
+                            changed = True
+                self.assertTrue(set(IxB.state_iterator()) <= live, (benchmark_name, test))
+
+
+class TestFinalStates(unittest.TestCase):
+
+    def test_final_state_mask(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            T = Automata.RTS(benchmark_name).get_T()
+            finals = set(T.get_final_states())
+            states = sorted(set(T.state_iterator()) | finals)
+            for n in (1, 2, 3):
+                for subset in itertools.combinations(states, n):
+                    mask = sum(1 << q for q in subset)
+                    self.assertEqual(T.are_final_states(mask), finals.issuperset(subset), (benchmark_name, subset))
+            self.assertEqual([q for q in states if T.is_final_state(q)], sorted(finals), benchmark_name)
+
+
+class TestMultiPairing(unittest.TestCase):
+
+    def test_accepts_the_language_of_every_pairing(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            multi = rts.get_multi_pairing(testcases)
+            for test in testcases:
+                difference = language_difference(rts.get_IxB(test), multi,
+                                                 lambda state: test in multi.final_properties(state))
+                self.assertIsNone(difference, (benchmark_name, test))
+
+
+class TestLazyPairing(unittest.TestCase):
+
+    def test_answers_like_the_eager_pairing(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            (eager_rts, lazy_rts) = (Automata.RTS(benchmark_name), Automata.RTS(benchmark_name, lazy_pairing=True))
+            for test in testcases:
+                (eager, lazy) = (eager_rts.get_IxB(test), lazy_rts.get_IxB(test))
+                name = (benchmark_name, test)
+                live = set(lazy.state_iterator())
+                self.assertEqual(live, set(eager.state_iterator()) | set(eager.get_final_states()), name)
+                self.assertEqual(sorted(lazy.get_final_states()), sorted(eager.get_final_states()), name)
+                self.assertEqual(lazy.partial_sigma_origin, eager.partial_sigma_origin, name)
+                self.assertEqual(lazy.partial_sigma_target, eager.partial_sigma_target, name)
+                for state in live:
+                    self.assertEqual(sorted(t for t in lazy.get_transitions(state) if t[1] in live),
+                                     sorted(eager.get_transitions(state)), (name, state))
+
+    def test_unknown_attributes_are_not_forwarded(self):
+        lazy = Automata.RTS("token-passing.json", lazy_pairing=True).get_IxB("notoken")
+        with self.assertRaises(AttributeError):
+            lazy.copy_with_restricted_trans
+        self.assertIsNone(lazy.eager)
+
+    def test_verdicts_like_the_eager_pairing(self):
+        for (benchmark_name, test) in (("Burns.json", "nomutex"), ("token-passing.json", "notoken"),
+                                       ("token-passing.json", "onetoken")):
+            for (oneshot, backward_pruning) in (("bfs", True), ("min_disprove", False)):
+                job = {"benchmark": benchmark_name, "property": test, "generator": "buffer_bfs", "oneshot": oneshot,
+                       "ignore_ambiguous": True, "backward_pruning": backward_pruning}
+                eager = Runner.execute_job(job)
+                lazy = Runner.execute_job(dict(job, lazy_pairing=True))
+                self.assertEqual(lazy["verdict"], eager["verdict"], (benchmark_name, test, oneshot))
+
+
+if __name__ == '__main__':
+    unittest.main()
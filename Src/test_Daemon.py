@@ -0,0 +1,54 @@
+"""
+Tests of the verification service (see Daemon.py)
+"""
+import Daemon
+import Synthetic
+import os
+import signal
+import time
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+def job(benchmark="token-passing.json", test="notoken"):
+    return {"benchmark": benchmark, "property": test, "generator": "buffer_bfs", "oneshot": "bfs",
+            "ignore_ambiguous": False}
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.service = Daemon.Service(1, 60, None, 100, 2, [])
+
+    def tearDown(self):
+        self.service.shutdown()
+
+    def test_keeps_the_last_finished_jobs(self):
+        ids = self.service.submit([job() for _ in range(4)])
+        states = [self.service.state(job_id, wait=60) for job_id in ids]
+        self.assertEqual(states[-1]["record"]["verdict"], "✓")
+        time.sleep(0.1)  # the callback of the last job may still run
+        self.assertIsNone(self.service.state(ids[0]))
+        self.assertIsNotNone(self.service.state(ids[-1]))
+        self.assertEqual(self.service.status()["finished"], 4)
+
+    def test_replaces_a_broken_pool(self):
+        (name, properties) = Synthetic.generate("token_ring", 2, 7, 0, 1)
+        [job_id] = self.service.submit([job(name, properties[0])])
+        while self.service.state(job_id)["state"] != "running":
+            time.sleep(0.05)
+        pool = self.service.pool
+        for process in list(pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        self.assertEqual(self.service.state(job_id, wait=60)["record"]["status"], "crashed")
+        time.sleep(0.1)
+        self.assertIsNot(self.service.pool, pool)
+        [job_id] = self.service.submit([job()])
+        self.assertEqual(self.service.state(job_id, wait=60)["record"]["verdict"], "✓")
+
+
+if __name__ == '__main__':
+    unittest.main()
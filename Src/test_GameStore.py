@@ -0,0 +1,71 @@
+"""
+Tests of the persistent step game store (see GameStore.py)
+"""
+import Automata
+import GameStore
+import Runner
+import os
+import tempfile
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+class TestStepGameStore(unittest.TestCase):
+
+    def setUp(self):
+        self.T = Automata.RTS("token-passing.json").get_T()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "games.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_games_survive_reopening(self):
+        store = GameStore.StepGameStore(self.path, self.T, "buffer_bfs/False")
+        self.assertTrue(store.cold)
+        store.save((0,), 0, 0, "t", (0,), [(1,), (2,)])
+        store.close()
+        reopened = GameStore.StepGameStore(self.path, self.T, "buffer_bfs/False")
+        self.assertFalse(reopened.cold)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.load((0,), 0, 0, "t", (0,)), [(1,), (2,)])
+        reopened.close()
+        other = GameStore.StepGameStore(self.path, self.T, "buffer_bfs/True")
+        self.assertIsNone(other.load((0,), 0, 0, "t", (0,)))
+        other.close()
+
+    def test_cold_store_finds_committed_games(self):
+        store = GameStore.StepGameStore(self.path, self.T, GameStore.variant("buffer_bfs", False, "bfs"))
+        self.assertTrue(store.cold)
+        store.save((0,), 0, 0, "t", (0,), [(1,), (2,)])
+        store.commit()
+        self.assertEqual(store.load((0,), 0, 0, "t", (0,)), [(1,), (2,)])
+        store.close()
+
+    def test_variants_are_separate(self):
+        complete = GameStore.StepGameStore(self.path, self.T, GameStore.variant("buffer_bfs", False, "bfs"))
+        complete.save((0,), 0, 0, "t", (0,), [(1,)])
+        complete.close()
+        subtree = GameStore.StepGameStore(self.path, self.T, GameStore.variant("buffer_bfs", False, "multi_disprove"))
+        self.assertIsNone(subtree.load((0,), 0, 0, "t", (0,)))
+        subtree.close()
+        reopened = GameStore.StepGameStore(self.path, self.T, GameStore.variant("buffer_bfs", False, "bfs"))
+        self.assertFalse(reopened.cold)
+        self.assertEqual(reopened.load((0,), 0, 0, "t", (0,)), [(1,)])
+        reopened.close()
+
+    def test_warm_run_keeps_the_verdict(self):
+        job = {"benchmark": "synapse.json", "property": "dirtyvalid", "generator": "buffer_bfs", "oneshot": "bfs",
+               "ignore_ambiguous": False, "store": self.path}
+        cold = Runner.execute_job(job)
+        warm = Runner.execute_job(job)
+        self.assertEqual((warm["verdict"], warm["states"]), (cold["verdict"], cold["states"]))
+        self.assertEqual(cold["cache_store_hits"], 0)
+        self.assertGreater(warm["cache_store_hits"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests of the instrumentation and profiling of oneshot runs (see Instrumentation.py)
+"""
+import Instrumentation
+import Runner
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    job = {"benchmark": "synapse.json", "property": "dirtyvalid", "generator": "buffer_bfs", "oneshot": "bfs",
+           "ignore_ambiguous": False}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "instrument.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_instrumentation(self):
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_instrumented_run_explores_the_same_states(self):
+        plain = Runner.execute_job(self.job)
+        instrumented = Runner.execute_job(dict(self.job, instrument=self.path))
+        for field in ("verdict", "states", "transitions", "cache_hits", "cache_misses"):
+            self.assertEqual(instrumented[field], plain[field], field)
+        [data] = self.read_instrumentation()
+        self.assertEqual(data["property"], "dirtyvalid")
+        self.assertLessEqual({"load", "search"}, set(data["timings"]))
+        self.assertEqual(sum(data["depths"].values()), data["step_games"])
+        self.assertGreater(data["step_games"], 0)
+        self.assertEqual([sample[1] for sample in data["samples"]],
+                         list(range(100, plain["states"] + 1, 100)))  # the explored states of each sample
+
+    def test_every_load_has_a_pairing_phase(self):
+        for _ in range(2):  # the second run loads the compiled benchmark
+            Runner.execute_job(dict(self.job, instrument=self.path))
+        (first, second) = self.read_instrumentation()
+        self.assertLessEqual({"load", "pairing", "search"}, set(first["timings"]))
+        self.assertEqual(second["timings"]["pairing"], 0.0)
+
+    def test_restriction_is_not_counted_in_the_search(self):
+        instrumentation = Instrumentation.Instrumentation()
+        with instrumentation.phase("search"):
+            with instrumentation.phase("restriction"):
+                time.sleep(0.2)
+        self.assertGreaterEqual(instrumentation.timings["restriction"], 0.2)
+        self.assertLess(instrumentation.timings["search"], 0.1)
+        Runner.execute_job(dict(self.job, oneshot="min_disprove", instrument=self.path))
+        [data] = self.read_instrumentation()
+        self.assertLessEqual({"restriction", "search"}, set(data["timings"]))
+
+    def test_profile_is_written_next_to_the_instrumentation(self):
+        Runner.execute_job(dict(self.job, instrument=self.path, profile="cprofile"))
+        [profile] = [name for name in os.listdir(self.directory.name) if name.endswith(".prof")]
+        stats = pstats.Stats(os.path.join(self.directory.name, profile))
+        self.assertGreater(stats.total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests of the records of runs and their comparison (see Results.py)
+"""
+import Results
+import Runner
+import os
+import tempfile
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+def job(**fields):
+    return dict({"benchmark": "Burns.json", "property": "nomutex", "generator": "buffer_bfs", "oneshot": "bfs",
+                 "ignore_ambiguous": False}, **fields)
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_record_of_a_run(self):
+        record = Runner.execute_job(job(benchmark="token-passing.json", property="onetoken"))
+        self.assertEqual((record["status"], record["verdict"]), ("done", "x"))
+        self.assertGreater(record["states"], 0)
+        self.assertLessEqual({"load", "search"}, set(record["timings"]))
+        self.assertEqual({field: record[field] for field in Results.KEY_FIELDS},
+                         job(benchmark="token-passing.json", property="onetoken"))
+
+    def test_records_without_modes_have_the_defaults(self):
+        record = {field: value for (field, value) in Results.make_record(job()).items()
+                  if field not in Results.MODE_FIELDS}
+        self.assertEqual(Results.record_key(record), Results.record_key(Results.make_record(job())))
+
+    def test_serial_records_have_no_peak_memory(self):
+        self.assertIsNone(Results.make_record(job())["peak_rss"])
+
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, records):
+        path = os.path.join(self.directory.name, name)
+        for record in records:
+            Results.write_record(path, record)
+        return path
+
+    def test_flags_slower_runs_and_changed_verdicts(self):
+        old = self.write("old", [Results.make_record(job(property=test), timings={"search": 1.0})
+                                 for test in ("slower", "disproved", "same")])
+        new = self.write("new", [Results.make_record(job(property="slower"), timings={"search": 2.0}),
+                                 Results.make_record(job(property="disproved"), result=(0, (0,)),
+                                                     timings={"search": 1.0}),
+                                 Results.make_record(job(property="same"), timings={"search": 1.05}),
+                                 Results.make_record(job(property="new"), timings={"search": 9.0})])
+        reasons = {key[1]: reason for (key, reason) in Results.compare(old, new, 0.1)}
+        self.assertEqual(set(reasons), {"slower", "disproved"})
+        self.assertTrue(reasons["slower"].startswith("time"))
+        self.assertEqual(reasons["disproved"], "verdict ✓ -> x")
+
+    def test_small_deltas_are_not_flagged(self):
+        old = self.write("old", [Results.make_record(job(), timings={"search": 0.001})])
+        new = self.write("new", [Results.make_record(job(), timings={"search": 0.005})])
+        self.assertEqual(Results.compare(old, new, 0.1, min_delta=0.01), [])
+        self.assertEqual(len(Results.compare(old, new, 0.1, min_delta=0.001)), 1)
+
+    def test_runs_of_different_modes_are_not_compared(self):
+        old = self.write("old", [Results.make_record(job(), timings={"search": 1.0})])
+        new = self.write("new", [Results.make_record(job(visited_mode="bitstate"), timings={"search": 9.0}),
+                                 Results.make_record(job(backward_pruning=True), timings={"search": 9.0})])
+        self.assertEqual(Results.compare(old, new, 0.1), [])
+
+    def test_runs_of_the_same_mode_are_compared(self):
+        old = self.write("old", [Results.make_record(job(cache={"cache_capacity": None}), timings={"search": 1.0})])
+        new = self.write("new", [Results.make_record(job(), timings={"search": 2.0})])
+        [(key, reason)] = Results.compare(old, new, 0.1)
+        self.assertEqual(Results.key_to_str(key), "Burns.json/nomutex/buffer_bfs/bfs/False")
+        self.assertTrue(reason.startswith("time"))
+
+
+if __name__ == '__main__':
+    unittest.main()
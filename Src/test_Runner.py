@@ -0,0 +1,49 @@
+"""
+Tests of the parallel benchmark runner (see Runner.py)
+"""
+import Runner
+import os
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+class TestRunJobs(unittest.TestCase):
+
+    def test_results_like_the_serial_run(self):
+        jobs = Runner.benchmark_jobs([("token-passing.json", ["manytoken", "notoken", "onetoken"])],
+                                     [("buffer_bfs", "bfs", False), ("buffer_dfs", "dfs", True)])
+        results = list(Runner.run_jobs(jobs, workers=2))
+        self.assertEqual(len(results), len(jobs))
+        for result in results:
+            self.assertEqual(result["status"], "done", result)
+            job = {field: result[field] for field in ("benchmark", "property", "generator", "oneshot",
+                                                      "ignore_ambiguous")}
+            self.assertEqual(result["verdict"], Runner.execute_job(job)["verdict"], job)
+
+    def test_multi_disprove_has_a_record_per_property(self):
+        testcases = ["manytoken", "notoken", "onetoken"]
+        [job] = Runner.benchmark_jobs([("token-passing.json", testcases)], [("buffer_bfs", "multi_disprove", True)])
+        self.assertEqual(job["properties"], testcases)
+        with self.assertRaises(ValueError):
+            Runner.execute_job(job)
+        results = {result["property"]: result for result in Runner.run_jobs([job], workers=1)}
+        self.assertEqual(sorted(results), testcases)
+        for single in Runner.benchmark_jobs([("token-passing.json", testcases)], [("buffer_bfs", "bfs", True)]):
+            result = results[single["property"]]
+            self.assertEqual((result["status"], result["verdict"]), ("done", Runner.execute_job(single)["verdict"]))
+
+    def test_timeout_does_not_stop_the_other_jobs(self):
+        slow = {"benchmark": "voting-token-passing.json", "property": "notokennomarked", "generator": "buffer_bfs",
+                "oneshot": "bfs", "ignore_ambiguous": False}
+        fast = dict(slow, benchmark="token-passing.json", property="onetoken")
+        results = {result["benchmark"]: result for result in Runner.run_jobs([slow, fast], workers=2, timeout=5)}
+        self.assertEqual(results["voting-token-passing.json"]["status"], "timeout")
+        self.assertEqual(results["token-passing.json"]["status"], "done")
+        self.assertEqual(results["token-passing.json"]["verdict"], "x")
+
+
+if __name__ == '__main__':
+    unittest.main()
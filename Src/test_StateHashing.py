@@ -0,0 +1,89 @@
+"""
+Tests of the memory bounded exploration (see StateHashing.py and Algorithms.OneshotSmart.column_id)
+"""
+import Runner
+import StateHashing
+import Synthetic
+import os
+import tracemalloc
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+def traced_peak(job):
+    """
+    :return: the record of the job and the peak of the memory allocated while it was executed in bytes
+    """
+    tracemalloc.start()
+    try:
+        record = Runner.execute_job(job)
+        return record, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class TestVisitedSets(unittest.TestCase):
+
+    def test_bitstate_hashes_from_error_bound(self):
+        self.assertEqual(StateHashing.BitstateSet(1 << 10).hashes, 3)
+        self.assertEqual(StateHashing.BitstateSet(1 << 10, error_bound=1e-3).hashes, 10)
+        self.assertEqual(StateHashing.BitstateSet(1 << 10, hashes=5, error_bound=1e-3).hashes, 5)
+
+    def test_bitstate_bound_exceeded(self):
+        visited = StateHashing.BitstateSet(1 << 6, error_bound=1e-2)
+        for i in range(visited.capacity() * 4):
+            visited.add((i, (i,)))
+        self.assertIsNotNone(visited.bound_exceeded_at)
+        self.assertLessEqual(visited.bound_exceeded_at, visited.capacity() * 2)
+
+    def test_fingerprint_membership(self):
+        visited = StateHashing.FingerprintSet(capacity=4)
+        for i in range(100):
+            visited.add((i, (i, i)))
+        self.assertEqual(len(visited), 100)
+        self.assertTrue(all((i, (i, i)) in visited for i in range(100)))
+        self.assertNotIn((100, (100, 100)), visited)
+
+
+class TestBoundedSearch(unittest.TestCase):
+
+    def job(self, states, **modes):
+        (name, properties) = Synthetic.generate("token_ring", 2, states, 0, 1)
+        return dict({"benchmark": name, "property": properties[0], "generator": "buffer_dfs", "oneshot": "bfs",
+                     "ignore_ambiguous": False}, **modes)
+
+    def test_memory_stays_flat(self):
+        bounded = {"visited_mode": "bitstate", "bitstate_bytes": 1 << 16, "max_columns": 256, "max_frontier": 256}
+        (small, small_peak) = traced_peak(self.job(5, **bounded))
+        (large, large_peak) = traced_peak(self.job(7, **bounded))
+        self.assertGreater(large["column_resets"] + large["dropped_states"], 0)
+        self.assertLess(large_peak, 2 * small_peak)  # the exact search of the large model needs about 100 times more
+        for record in (small, large):
+            self.assertFalse(record["exact"])
+            self.assertEqual(record["verdict"], "?")  # no counterexample, but the search is not exact
+
+    def test_stops_at_error_bound(self):
+        record = Runner.execute_job(self.job(5, visited_mode="bitstate", bitstate_bytes=1 << 6, error_bound=1e-2))
+        self.assertIsNotNone(record["stopped"])
+        self.assertEqual(record["verdict"], "?")
+
+
+class TestVisitedModes(unittest.TestCase):
+
+    def test_only_counterexamples_are_verdicts(self):
+        for test in ("notoken", "onetoken"):
+            job = {"benchmark": "token-passing.json", "property": test, "generator": "buffer_bfs", "oneshot": "bfs",
+                   "ignore_ambiguous": False}
+            exact = Runner.execute_job(job)
+            for mode in ("fingerprint", "bitstate"):
+                record = Runner.execute_job(dict(job, visited_mode=mode))
+                self.assertEqual(record["states"], exact["states"], (test, mode))
+                self.assertEqual(record["verdict"], "x" if exact["verdict"] == "x" else "?", (test, mode))
+                self.assertFalse(record["exact"])
+
+
+if __name__ == '__main__':
+    unittest.main()
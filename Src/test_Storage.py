@@ -0,0 +1,139 @@
+"""
+Tests of the storage backends of the transition relations (see Storage.py)
+"""
+import Automata
+import Main
+import ModelCache
+import Storage
+import itertools
+import os
+import tempfile
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+class TestEncoders(unittest.TestCase):
+
+    def test_state_encoder_is_injective(self):
+        for (benchmark_name, testcases) in Main.benchmarks:
+            rts = Automata.RTS(benchmark_name)
+            for test in testcases:
+                encoder = rts.get_IxB(test).state_encoder
+                pairs = list(itertools.product(*map(range, encoder.radices)))
+                codes = [encoder.encode(list(pair)) for pair in pairs]
+                self.assertEqual(len(set(codes)), len(pairs), (benchmark_name, test))
+                self.assertTrue(all(0 <= code < encoder.size for code in codes), (benchmark_name, test))
+                for (pair, code) in zip(pairs, codes):
+                    self.assertEqual(tuple(encoder.decode(code)), pair, (benchmark_name, test))
+
+    def test_subset_encoder_is_injective(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            states = sorted(Automata.RTS(benchmark_name).get_T().state_iterator())[:10]
+            subsets = [subset for n in range(len(states) + 1) for subset in itertools.combinations(states, n)]
+            codes = [Storage.SubsetEncoder.encode(subset) for subset in subsets]
+            self.assertEqual(len(set(codes)), len(subsets), benchmark_name)
+            for (subset, code) in zip(subsets, codes):
+                self.assertEqual(Storage.SubsetEncoder.decode(code), list(subset), benchmark_name)
+
+    def test_dense_encoder_of_the_subset_construction(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            dfa = Automata.RTS(benchmark_name).get_T().nfa_to_dfa()
+            encoder = dfa.state_encoder
+            subsets = [tuple(encoder.decode(q)) for q in range(len(encoder))]
+            self.assertEqual(len(set(subsets)), len(subsets), benchmark_name)
+            for (q, subset) in enumerate(subsets):
+                self.assertEqual(encoder.encode(Storage.SubsetEncoder.encode(subset)), q, benchmark_name)
+
+
+class TestTargetSymbolIndex(unittest.TestCase):
+
+    def test_groups_the_transitions_by_target_symbol(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            T = Automata.RTS(benchmark_name).get_T()
+            alphabet_map = T.get_alphabet_map()
+            index = T.get_target_index()
+            for q in T.state_iterator():
+                (used_y, groups) = index.get_entry(q)
+                self.assertEqual(sum(groups), used_y, (benchmark_name, q))
+                grouped = sorted((x_bit, y_bit, p) for y_bit in groups for (x_bit, p) in groups[y_bit])
+                expected = sorted((1 << alphabet_map.get_x(x_y_int), 1 << alphabet_map.get_y(x_y_int), p)
+                                  for (x_y_int, p) in T.get_transitions(q))
+                self.assertEqual(grouped, expected, (benchmark_name, q))
+
+
+class TestNumpyStorage(unittest.TestCase):
+
+    @unittest.skipIf(Storage.numpy is None, "requires numpy")
+    def test_successors_like_the_simple_storage(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            T = Automata.RTS(benchmark_name).get_T()
+            alphabet_map = T.get_alphabet_map()
+            copy = T.copy_with_storage(Storage.NumpyStorageNFA(alphabet_map))
+            symbols = [alphabet_map.combine_x_and_y(x, y) for x in range(alphabet_map.get_sigma_size())
+                       for y in range(alphabet_map.get_sigma_size())]
+            for q in T.state_iterator():
+                for x_y_int in symbols:
+                    self.assertEqual(set(copy.get_successors(q, x_y_int) or ()),  # duplicate transitions are merged
+                                     set(T.get_successors(q, x_y_int) or ()), (benchmark_name, q, x_y_int))
+
+    @unittest.skipIf(Storage.numpy is None, "requires numpy")
+    def test_prefix_moves_like_target_symbol_index(self):
+        for (benchmark_name, _) in Main.benchmarks:
+            T = Automata.RTS(benchmark_name).get_T()
+            alphabet_map = T.get_alphabet_map()
+            expected = T.get_target_index()
+            index = T.copy_with_storage(Storage.NumpyStorageNFA(alphabet_map)).get_target_index()
+            index.max_prefixes = 4  # the memo is cleared several times
+            states = sorted(T.state_iterator())
+            prefixes = [prefix for n in (1, 2) for prefix in itertools.product(states, repeat=n)]
+            for prefix in prefixes[:200]:
+                for I in (0, 1, 5, (1 << alphabet_map.get_sigma_size()) - 1):
+                    self.assertEqual(list(index.prefix_moves(prefix, I)), list(expected.prefix_moves(prefix, I)),
+                                     (benchmark_name, prefix, I))
+            self.assertLessEqual(len(index.prefixes), index.max_prefixes)
+
+
+class TestCompiledStorage(unittest.TestCase):
+
+    def assert_same_transducer(self, expected, compiled, name):
+        """
+        The states, transitions and successors must also be in the same order, as it decides the exploration order
+        """
+        self.assertEqual(list(compiled.state_iterator()), list(expected.state_iterator()), name)
+        self.assertEqual(compiled.get_initial_states(), expected.get_initial_states(), name)
+        self.assertEqual(compiled.get_final_states(), expected.get_final_states(), name)
+        symbols = range(expected.get_alphabet_map().get_sigma_size() ** 2)
+        for q in expected.state_iterator():
+            self.assertEqual(list(compiled.get_transitions(q)), list(expected.get_transitions(q)), (name, q))
+            for x_y_int in symbols:
+                self.assertEqual(compiled.get_successors(q, x_y_int), expected.get_successors(q, x_y_int),
+                                 (name, q, x_y_int))
+
+    def test_compiled_load_equals_json_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for (benchmark_name, _) in Main.benchmarks:
+                rts = Automata.RTS(benchmark_name)
+                path = os.path.join(directory, "rts")
+                ModelCache.write_compiled(rts, path)
+                compiled = ModelCache.read_compiled(path)
+                self.assert_same_transducer(rts.get_T(), compiled.get_T(), (benchmark_name, "T"))
+                self.assert_same_transducer(rts.get_I(), compiled.get_I(), (benchmark_name, "I"))
+                for name in rts.B_dict:
+                    self.assert_same_transducer(rts.get_B(name), compiled.get_B(name), (benchmark_name, name))
+                    self.assert_same_transducer(rts.get_IxB(name), compiled.get_IxB(name), (benchmark_name, name))
+
+    def test_compiled_storage_is_read_only(self):
+        storage = Storage.CompiledStorageNFA([0], [0, 3], [5, 3, 5], [1, 2, 0], [3, 5, 5], [1, 0, 2])
+        self.assertEqual(list(storage.transition_iterator(0)), [(5, 1), (3, 2), (5, 0)])
+        self.assertEqual(storage.get_successors(0, 5), [1, 0])
+        self.assertEqual(storage.get_successors(0, 3), [2])
+        self.assertIsNone(storage.get_successors(0, 4))
+        with self.assertRaises(Storage.ReadOnlyStorageError):
+            storage.add_transition(0, 3, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
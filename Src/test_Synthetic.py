@@ -0,0 +1,40 @@
+"""
+Tests of the generated RTS families (see Synthetic.py)
+"""
+import Runner
+import Synthetic
+import os
+import unittest
+
+
+def setUpModule():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # the benchmarks are loaded relative to Src
+
+
+class TestFamilies(unittest.TestCase):
+
+    def test_token_ring_properties_are_proved(self):
+        for (alphabet_size, states) in ((2, 3), (3, 5)):
+            (name, properties) = Synthetic.generate("token_ring", alphabet_size, states, 0.5, 2)
+            self.assertEqual(properties, ["notoken", "token2"])
+            for test in properties:
+                record = Runner.execute_job({"benchmark": name, "property": test, "generator": "buffer_bfs",
+                                             "oneshot": "bfs", "ignore_ambiguous": False})
+                self.assertEqual(record["verdict"], "✓", (name, test))
+
+    def test_sweep_has_a_record_per_value_and_property(self):
+        records = Synthetic.sweep("token_ring", {"alphabet_size": 2, "states": 3, "density": 0.0, "properties": 2},
+                                  "states", [3, 4], [("buffer_bfs", "bfs", False)])
+        self.assertEqual(sorted((r["parameters"]["states"], r["property"]) for r in records),
+                         [(3, "notoken"), (3, "token2"), (4, "notoken"), (4, "token2")])
+        self.assertTrue(all(r["verdict"] == "✓" for r in records))
+        self.assertIn("buffer_bfs/bfs/F", Synthetic.sweep_table(records, "states"))
+
+    def test_sweep_of_multi_disprove_has_a_record_per_property(self):
+        records = Synthetic.sweep("token_ring", {"alphabet_size": 2, "states": 3, "density": 0.0, "properties": 2},
+                                  "states", [3], [("buffer_bfs", "multi_disprove", True)])
+        self.assertEqual(sorted((r["property"], r["verdict"]) for r in records), [("notoken", "✓"), ("token2", "✓")])
+
+
+if __name__ == '__main__':
+    unittest.main()
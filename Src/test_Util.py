@@ -0,0 +1,60 @@
+"""
+Tests of the column table and the helpers of the search (see Util.py)
+"""
+import Util
+import unittest
+
+
+class TestColumnTable(unittest.TestCase):
+
+    def test_intern_and_unpack(self):
+        table = Util.ColumnTable()
+        columns = [(), (0,), (3, 1), (1, 3), (7, 0, 255)]
+        ids = [table.intern(column) for column in columns]
+        self.assertEqual(len(set(ids)), len(columns))
+        self.assertEqual(ids[0], table.empty)
+        self.assertEqual([table.intern(list(column)) for column in columns], ids)  # lists and tuples are equal
+        for (column, column_id) in zip(columns, ids):
+            self.assertEqual(table.get_column(column_id), column)
+            self.assertEqual(table.get_mask(column_id), sum(1 << q for q in column))
+            self.assertTrue(all(table.contains(column_id, q) for q in column))
+            self.assertFalse(table.contains(column_id, 2))
+
+    def test_wide_states_keep_the_ids(self):
+        table = Util.ColumnTable()
+        ids = [table.intern(column) for column in [(0, 1), (255,), (2, 0)]]
+        wide = table.intern((256, 1))
+        self.assertEqual(table.typecode, "I")
+        self.assertEqual([table.intern(column) for column in [(0, 1), (255,), (2, 0)]], ids)
+        self.assertEqual(table.get_column(ids[2]), (2, 0))
+        self.assertEqual(table.get_column(wide), (256, 1))
+        self.assertEqual(len(table), 5)
+
+    def test_extend(self):
+        table = Util.ColumnTable()
+        column_id = table.intern((2, 0))
+        extended = table.extend(column_id, 5)
+        self.assertEqual(table.get_column(extended), (2, 0, 5))
+        self.assertEqual(table.extend(column_id, 5), extended)
+        self.assertEqual(table.intern((2, 0, 5)), extended)
+
+
+class TestVisitedColumns(unittest.TestCase):
+
+    def test_snapshots_keep_the_order_of_the_winners(self):
+        table = Util.ColumnTable()
+        visited = Util.VisitedColumns()
+        for column in ((2, 0), (1,), (), (2, 0)):
+            visited.add(table.intern(column))
+        snapshot = visited.snapshot()
+        self.assertEqual([table.get_column(column_id) for column_id in snapshot], [(2, 0), (1,), ()])
+        self.assertIs(visited.snapshot(), snapshot)  # shared until a new column is added
+        visited.add(table.intern((3,)))
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(len(visited.snapshot()), 4)
+        self.assertIn(table.intern((1,)), visited)
+        self.assertNotIn(table.intern((0, 2)), visited)
+
+
+if __name__ == '__main__':
+    unittest.main()